@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+from time import monotonic, time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+GENERATION_KEY = 'user-generation:{user_id}'
+
+
+class UserCache:
+    """Ограниченный по размеру LRU-кеш пользователей с временем жизни
+    записей. Ключ - id пользователя, id токена и поколение пользователя."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self.lock:
+            self.entries[key] = (user, monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(
+    settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL
+)
+
+
+def get_generation(user_id):
+    """Поколение пользователя из общего кеша Django. Если его нет
+    в кеше, создается новое, что только сбросит записи этого
+    пользователя в кешах процессов."""
+    return cache.get_or_set(
+        GENERATION_KEY.format(user_id=user_id), time, timeout=None
+    )
+
+
+def bump_generation(user_id):
+    cache.set(GENERATION_KEY.format(user_id=user_id), time(), timeout=None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Аутентификация по JWT-токену без запроса пользователя к базе
+    для пользователей, уже найденных по этому токену.
+    Поколение пользователя в общем кеше меняется при любом изменении
+    или удалении пользователя, и записи с прежним поколением перестают
+    использоваться во всех процессах.
+    """
+
+    def get_user(self, validated_token):
+        user_id = str(validated_token.get(api_settings.USER_ID_CLAIM))
+        key = (
+            user_id,
+            validated_token.get(api_settings.JTI_CLAIM),
+            get_generation(user_id),
+        )
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        return copy(user)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Сбрасывает кеш при изменении пользователя, в том числе его роли,
+    статуса активности или администратора."""
+    bump_generation(str(getattr(instance, api_settings.USER_ID_FIELD)))
@@ -1,7 +1,13 @@
+import re
+
+from django.db import connection
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
 
 from reviews.models import Title
 
+SEARCH_WORD = re.compile(r'\w+')
+
 
 class TitleFilter(filters.FilterSet):
     """Настройки фильтрации для модели Произведения.
@@ -16,3 +22,34 @@ class TitleFilter(filters.FilterSet):
     class Meta:
         model = Title
         fields = ['name', 'year']
+
+
+class FullTextSearchFilter(SearchFilter):
+    """Полнотекстовый поиск по индексу SQLite FTS5.
+    Индекс <таблица>_fts создается миграцией и поддерживается триггерами.
+    Каждое слово запроса ищется как префикс, индекс присоединяется
+    к таблице модели один раз, результаты упорядочены по релевантности
+    (столбец rank, bm25). Для других баз данных используется
+    обычный поиск SearchFilter по полям search_fields.
+    """
+
+    def get_match_query(self, request):
+        words = SEARCH_WORD.findall(
+            request.query_params.get(self.search_param, '')
+        )
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def filter_queryset(self, request, queryset, view):
+        if connection.vendor != 'sqlite':
+            return super().filter_queryset(request, queryset, view)
+        match = self.get_match_query(request)
+        if not match:
+            return queryset
+        table = queryset.model._meta.db_table
+        fts = f'{table}_fts'
+        return queryset.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'{fts}.rank'},
+        ).order_by('search_rank', *queryset.query.order_by)
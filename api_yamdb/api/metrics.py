@@ -0,0 +1,182 @@
+from bisect import bisect_left
+from threading import Lock
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+counters_lock = Lock()
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        total = 0
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            yield f'{name}_bucket', {**labels, 'le': bound}, total
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, self.count
+
+
+class Family:
+    """Набор метрик одного имени с разными значениями меток."""
+
+    def __init__(self, name, kind, help_text, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.buckets = buckets
+        self.values = {}
+
+    def inc(self, labels=(), value=1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def observe(self, labels, value):
+        histogram = self.values.get(labels)
+        if histogram is None:
+            histogram = self.values[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            labels = dict(labels)
+            if isinstance(value, Histogram):
+                yield from value.samples(self.name, labels)
+            else:
+                yield self.name, labels, value
+
+
+request_duration = Family(
+    'yamdb_http_request_duration_seconds', 'histogram',
+    'Время обработки запроса.', LATENCY_BUCKETS,
+)
+responses = Family(
+    'yamdb_http_responses_total', 'counter',
+    'Количество ответов по кодам статуса.',
+)
+in_flight = Family(
+    'yamdb_http_requests_in_flight', 'gauge',
+    'Количество запросов в обработке.',
+)
+db_queries = Family(
+    'yamdb_db_queries_per_request', 'histogram',
+    'Количество запросов к базе за один запрос.', QUERY_COUNT_BUCKETS,
+)
+db_duration = Family(
+    'yamdb_db_duration_seconds', 'histogram',
+    'Время запросов к базе за один запрос.', LATENCY_BUCKETS,
+)
+cache_requests = Family(
+    'yamdb_response_cache_requests_total', 'counter',
+    'Обращения к кешу ответов по результату (hit, miss).',
+)
+events = Family(
+    'yamdb_events_total', 'counter',
+    'Прочие события, например single_flight_stampedes.',
+)
+view_requests = Family(
+    'yamdb_view_requests_total', 'counter',
+    'Количество запросов по представлению и действию.',
+)
+VIEW_TOTALS = {
+    'queries': Family(
+        'yamdb_view_db_queries_total', 'counter',
+        'Запросы к базе по представлению и действию.',
+    ),
+    'db_time': Family(
+        'yamdb_view_db_duration_seconds_total', 'counter',
+        'Время запросов к базе по представлению и действию.',
+    ),
+    'render_time': Family(
+        'yamdb_view_render_duration_seconds_total', 'counter',
+        'Время отрисовки ответа по представлению и действию.',
+    ),
+    'duration': Family(
+        'yamdb_view_duration_seconds_total', 'counter',
+        'Время обработки запроса по представлению и действию.',
+    ),
+    'size': Family(
+        'yamdb_view_response_bytes_total', 'counter',
+        'Размер ответов по представлению и действию.',
+    ),
+}
+FAMILIES = (
+    request_duration, responses, in_flight, db_queries, db_duration,
+    cache_requests, events, view_requests, *VIEW_TOTALS.values(),
+)
+
+
+def increment(name, value=1):
+    """Увеличивает счетчик события в памяти процесса."""
+    with counters_lock:
+        events.inc((('event', name),), value)
+
+
+def record_request(view, **values):
+    """Добавляет показатели запроса к суммам по представлению."""
+    labels = (('view', view),)
+    with counters_lock:
+        view_requests.inc(labels)
+        for name, value in values.items():
+            VIEW_TOTALS[name].inc(labels, value)
+
+
+def request_started():
+    with counters_lock:
+        in_flight.inc(value=1)
+
+
+def request_finished(route, method, status, duration, queries, db_time):
+    """Записывает запрос в гистограммы и счетчики по имени маршрута."""
+    labels = (('method', method), ('route', route))
+    with counters_lock:
+        in_flight.inc(value=-1)
+        request_duration.observe(labels, duration)
+        responses.inc(labels + (('status', str(status)),))
+        db_queries.observe(labels, queries)
+        db_duration.observe(labels, db_time)
+
+
+def cache_lookup(hit):
+    with counters_lock:
+        cache_requests.inc((('result', 'hit' if hit else 'miss'),))
+
+
+def escape(value):
+    return (
+        value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    )
+
+
+def render():
+    """Метрики процесса в текстовом формате Prometheus."""
+    lines = []
+    with counters_lock:
+        for family in FAMILIES:
+            lines.append(f'# HELP {family.name} {family.help_text}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for name, labels, value in family.samples():
+                if labels:
+                    pairs = ','.join(
+                        f'{key}="{escape(label)}"'
+                        for key, label in labels.items()
+                    )
+                    name = f'{name}{{{pairs}}}'
+                lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
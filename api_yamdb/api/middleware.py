@@ -0,0 +1,220 @@
+import json
+import logging
+import pstats
+from cProfile import Profile
+from time import perf_counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from . import metrics
+from .authentication import CachedJWTAuthentication
+from .permissions import IsAdmin
+
+UNMATCHED_ROUTE = 'unmatched'
+
+logger = logging.getLogger('api.performance')
+
+
+def get_view_name(view_func):
+    """Имя представления вида TitleViewSet.list или signup_view."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return view_func.__name__
+    return cls.__name__
+
+
+class RequestStats:
+    """Показатели одного запроса."""
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries += 1
+
+    def rendered(self, response):
+        self.render_time = perf_counter() - self.render_started
+
+
+class RequestMetricsMiddleware:
+    """Собирает для каждого представления количество и время запросов
+    к базе, время отрисовки ответа (сериализации в JSON), общее время
+    и размер ответа, а также метрики Prometheus по имени маршрута.
+    Запросы считаются через execute_wrapper, поэтому
+    DEBUG не нужен. Запросы сверх REQUEST_QUERY_BUDGET или дольше
+    REQUEST_TIME_BUDGET секунд пишутся в лог api.performance.
+    При SERVER_TIMING показатели добавляются в заголовок Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request.request_stats = RequestStats()
+        metrics.request_started()
+        start = perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        duration = perf_counter() - start
+        match = request.resolver_match
+        metrics.request_finished(
+            match.url_name if match else UNMATCHED_ROUTE,
+            request.method,
+            response.status_code,
+            duration,
+            stats.queries,
+            stats.db_time,
+        )
+        if stats.view is None:
+            return response
+        size = 0 if response.streaming else len(response.content)
+        metrics.record_request(
+            stats.view,
+            queries=stats.queries,
+            db_time=stats.db_time,
+            render_time=stats.render_time,
+            duration=duration,
+            size=size,
+        )
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={stats.db_time * 1000:.1f};'
+                f'desc="{stats.queries} queries", '
+                f'render;dur={stats.render_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        if (
+            stats.queries > settings.REQUEST_QUERY_BUDGET
+            or duration > settings.REQUEST_TIME_BUDGET
+        ):
+            logger.warning(
+                '%s %s (%s): %d queries, db %.1f ms, render %.1f ms, '
+                'total %.1f ms, %d bytes',
+                request.method, request.path, stats.view, stats.queries,
+                stats.db_time * 1000, stats.render_time * 1000,
+                duration * 1000, size,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = get_view_name(view_func)
+        actions = getattr(view_func, 'actions', None)
+        if actions:
+            action = actions.get(request.method.lower())
+            if action is not None:
+                name = f'{name}.{action}'
+        request.request_stats.view = name
+
+    def process_template_response(self, request, response):
+        stats = request.request_stats
+        stats.render_started = perf_counter()
+        response.add_post_render_callback(stats.rendered)
+        return response
+
+
+class QueryLog:
+    """Тексты и время выполнения SQL-запросов."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params),
+                'time': round(perf_counter() - start, 6),
+            })
+
+
+def top_functions(profile, limit):
+    """Функции с наибольшим суммарным временем (cumulative)."""
+    stats = pstats.Stats(profile).sort_stats(pstats.SortKey.CUMULATIVE)
+    functions = []
+    for function in stats.fcn_list[:limit]:
+        calls, total_calls, own_time, cumulative, _ = stats.stats[function]
+        filename, line, name = function
+        functions.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': total_calls,
+            'own_time': round(own_time, 6),
+            'cumulative': round(cumulative, 6),
+        })
+    return functions
+
+
+class ProfilingMiddleware:
+    """Профилирование одного запроса по заголовку X-Profile или
+    параметру profile, только для администратора (IsAdmin).
+    Результат сохраняется в PROFILE_DIR: файл pstats и сводка
+    с самыми долгими функциями и SQL-запросами. Адрес сводки
+    возвращается в заголовке X-Profile. Без флага запрос
+    обрабатывается как обычно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            'HTTP_X_PROFILE' not in request.META
+            and 'profile' not in request.GET
+        ):
+            return self.get_response(request)
+        if not self.is_admin(request):
+            return self.get_response(request)
+        return self.profile(request)
+
+    @staticmethod
+    def is_admin(request):
+        drf_request = Request(
+            request, authenticators=(CachedJWTAuthentication(),)
+        )
+        try:
+            return IsAdmin().has_permission(drf_request, None)
+        except APIException:
+            return False
+
+    def profile(self, request):
+        profile = Profile()
+        query_log = QueryLog()
+        with connection.execute_wrapper(query_log):
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        profile_id = uuid4()
+        directory = settings.PROFILE_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(directory / f'{profile_id.hex}.prof')
+        summary = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'functions': top_functions(profile, settings.PROFILE_TOP),
+            'queries': query_log.queries,
+        }
+        with open(directory / f'{profile_id.hex}.json', 'w') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+        response['X-Profile'] = request.build_absolute_uri(
+            reverse('api:profile', args=(profile_id,))
+        )
+        return response
@@ -0,0 +1,138 @@
+from hashlib import blake2b
+from time import monotonic, sleep
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from . import metrics
+from reviews.versions import get_etag, get_versions
+
+RESPONSE_CACHE_KEY = 'response:{etag}:{resource}'
+STALE_RESPONSE_CACHE_KEY = 'response-stale:{resource}'
+
+
+def get_response_cache_key(etag, url, query, template=RESPONSE_CACHE_KEY):
+    """Адрес с параметрами хешируется, чтобы длина ключа не зависела
+    от запроса: memcached не принимает ключи длиннее 250 символов."""
+    resource = blake2b(f'{url}?{query}'.encode(), digest_size=16)
+    return template.format(etag=etag, resource=resource.hexdigest())
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы (If-None-Match, If-Modified-Since).
+    ETag и Last-Modified строятся по версиям ресурсов из кеша, которые
+    обновляются сигналами моделей. Если данные не изменились, ответ 304
+    отдается без запросов к базе и без сериализации.
+    Ключи версий могут ссылаться на параметры адреса, например 'title:{pk}'.
+    Данные ответов анонимным пользователям кешируются по адресу,
+    упорядоченным параметрам запроса и ETag: изменение любой версии
+    делает прежние записи недоступными. Для действий из
+    single_flight_actions промах кеша обрабатывает один запрос.
+    """
+
+    single_flight_actions = ()
+
+    def get_response_cache_key(self, request, etag,
+                               template=RESPONSE_CACHE_KEY):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        return get_response_cache_key(
+            etag, request.build_absolute_uri(request.path), query, template
+        )
+
+    def single_flight_response(self, cache, key, request, etag, handler,
+                               *args, **kwargs):
+        """Собирает ответ при промахе кеша только в одном обработчике.
+        Остальные получают прошлую версию ответа, если она есть,
+        или недолго ждут появления новой, а затем собирают ответ сами."""
+        stale_key = self.get_response_cache_key(
+            request, etag, STALE_RESPONSE_CACHE_KEY
+        )
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                response = handler(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(
+                        key, response.data, settings.RESPONSE_CACHE_TIMEOUT
+                    )
+                    cache.set(
+                        stale_key, response.data,
+                        settings.STALE_RESPONSE_CACHE_TIMEOUT
+                    )
+            finally:
+                cache.delete(lock_key)
+            return response
+        metrics.increment('single_flight_stampedes')
+        data = cache.get(stale_key)
+        if data is not None:
+            response = Response(data)
+            response.stale = True
+            return response
+        deadline = monotonic() + settings.SINGLE_FLIGHT_WAIT
+        while monotonic() < deadline:
+            sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+        return handler(request, *args, **kwargs)
+
+    def cached_response(self, request, etag, handler, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        key = self.get_response_cache_key(request, etag)
+        data = cache.get(key)
+        metrics.cache_lookup(data is not None)
+        if data is not None:
+            return Response(data)
+        if self.action in self.single_flight_actions:
+            return self.single_flight_response(
+                cache, key, request, etag, handler, *args, **kwargs
+            )
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def conditional_response(self, request, keys, handler, *args, **kwargs):
+        versions = get_versions(key.format(**kwargs) for key in keys)
+        etag = get_etag(versions)
+        last_modified = int(max(versions))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.cached_response(
+                request, etag, handler, *args, **kwargs
+            )
+        if response.status_code in (200, 304) and not getattr(
+            response, 'stale', False
+        ):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class ConditionalListMixin(ConditionalGetMixin):
+    """Условные GET-запросы для списка объектов."""
+    list_version_keys = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.list_version_keys, super().list, *args, **kwargs
+        )
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+    """Условные GET-запросы для отдельного объекта."""
+    detail_version_keys = ()
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.detail_version_keys, super().retrieve,
+            *args, **kwargs
+        )
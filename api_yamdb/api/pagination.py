@@ -0,0 +1,184 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+INVALID_CURSOR = 'Некорректный курсор.'
+CURSOR_CONFLICT = (
+    'Параметр {param} нельзя использовать вместе с cursor: '
+    'при пагинации по курсору порядок задан ключом курсора.'
+)
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (курсору).
+    Страница выбирается условием на значения полей сортировки последнего
+    объекта предыдущей страницы, а не смещением, поэтому любая страница
+    стоит столько же, сколько первая. Общее количество объектов
+    не подсчитывается. Последнее поле сортировки должно быть уникальным
+    и ни одно из полей не может быть NULL.
+    """
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+
+    def __init__(self, page_size, ordering=None):
+        self.page_size = page_size
+        if ordering is not None:
+            self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        reverse, position = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset.model, position)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.reverse_field(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = bool(self.page), has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.encode_cursor(True, self.page[0])
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        """Условие «строго после позиции» для составного ключа:
+        (a > x) OR (a = x AND b > y) OR ..."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            reverse, position = json.loads(
+                urlsafe_b64decode(encoded.encode())
+            )
+        except (BinasciiError, UnicodeDecodeError, TypeError, ValueError):
+            raise NotFound(INVALID_CURSOR)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+        ):
+            raise NotFound(INVALID_CURSOR)
+        return bool(reverse), position
+
+    def clean_position(self, model, position):
+        """Приводит значения курсора к типам полей сортировки.
+        Подделанный курсор со значениями не тех типов дает 404,
+        а не ошибку при построении запроса."""
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            if value is None or isinstance(value, (dict, list)):
+                raise NotFound(INVALID_CURSOR)
+            try:
+                value = model._meta.get_field(
+                    field.lstrip('-')
+                ).to_python(value)
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(INVALID_CURSOR)
+            cleaned.append(value)
+        return cleaned
+
+    def encode_cursor(self, reverse, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        encoded = urlsafe_b64encode(
+            json.dumps([reverse, position]).encode()
+        ).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """Постраничная пагинация с переходом на пагинацию по ключу,
+    если в запросе передан параметр cursor (в том числе пустой).
+    Клиенты, использующие номера страниц, работают как прежде.
+    Порядок при пагинации по курсору задается ключом, поэтому параметры
+    сортировки и поиска по релевантности фильтров представления вместе
+    с cursor отклоняются.
+    """
+    keyset_ordering = ('-id',)
+    conflicting_params = ('ordering_param', 'search_param')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param not in request.query_params:
+            self.keyset = None
+            return super().paginate_queryset(queryset, request, view)
+        self.check_conflicts(request, view)
+        self.keyset = KeysetPagination(
+            self.get_page_size(request), self.keyset_ordering
+        )
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    def check_conflicts(self, request, view):
+        for backend in getattr(view, 'filter_backends', ()):
+            for attr in self.conflicting_params:
+                param = getattr(backend, attr, None)
+                if param and request.query_params.get(param):
+                    raise ValidationError(
+                        {param: CURSOR_CONFLICT.format(param=param)}
+                    )
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class TitlePagination(PageNumberOrKeysetPagination):
+    """Пагинация произведений, курсор по названию и id."""
+    keyset_ordering = ('name', 'id')
+
+
+class PubDatePagination(PageNumberOrKeysetPagination):
+    """Пагинация отзывов и комментариев, курсор по дате и id."""
+    keyset_ordering = ('-pub_date', '-id')
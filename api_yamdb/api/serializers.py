@@ -1,11 +1,16 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import IntegrityError, transaction
+from django.utils.encoding import smart_str
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import CurrentUserDefault
-from rest_framework.generics import get_object_or_404
+from rest_framework.relations import MANY_RELATION_KWARGS
 from rest_framework.serializers import IntegerField
+from rest_framework.settings import api_settings
 
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleGenres, User)
+from reviews import versions
 from reviews.validators import validate_username
 from reviews.models import SCORE_MIN_VALUE, SCORE_MAX_VALUE
 
@@ -13,6 +18,79 @@ EMAIL_LENGTH = 254
 USERNAME_LENGTH = 150
 GENRE_DOES_NOT_EXIST = 'Такого жанра не существует: {genre}.'
 CANNOT_ADD_MORE_THAN_ONE_COMMENT = 'Нельзя добавить больше одного комментария'
+SLUG_CACHE = 'slug_cache'
+
+
+class SlugCache:
+    """Объекты, найденные по слагу, на время одного запроса.
+    Слаги загружаются одним запросом slug__in на модель, повторно
+    встреченные слаги (в том числе отсутствующие) к базе не обращаются.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.loaded = {}
+
+    def load(self, queryset, slug_field, slugs):
+        model = queryset.model
+        objects = self.objects.setdefault(model, {})
+        loaded = self.loaded.setdefault(model, set())
+        missing = {
+            slug for slug in slugs if isinstance(slug, str)
+        } - loaded
+        if missing:
+            for obj in queryset.filter(**{f'{slug_field}__in': missing}):
+                objects[getattr(obj, slug_field)] = obj
+            loaded |= missing
+
+    def get(self, model, slug):
+        return self.objects.get(model, {}).get(slug)
+
+
+def get_slug_cache(context):
+    """Кеш слагов из контекста сериализатора, общий для всех полей
+    и всех объектов одного запроса."""
+    return context.setdefault(SLUG_CACHE, SlugCache())
+
+
+class CachedManySlugRelatedField(serializers.ManyRelatedField):
+    """Список слагов, загружаемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child_relation.load(data)
+        return super().to_internal_value(data)
+
+
+class CachedSlugRelatedField(serializers.SlugRelatedField):
+    """SlugRelatedField, который берет объекты из SlugCache запроса."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return CachedManySlugRelatedField(**list_kwargs)
+
+    def load(self, slugs):
+        get_slug_cache(self.context).load(
+            self.get_queryset(), self.slug_field, slugs
+        )
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        self.load((data,))
+        obj = get_slug_cache(self.context).get(
+            self.get_queryset().model, data
+        )
+        if obj is None:
+            self.fail(
+                'does_not_exist', slug_name=self.slug_field,
+                value=smart_str(data),
+            )
+        return obj
 
 
 class SignupSerializer(serializers.Serializer):
@@ -69,15 +147,16 @@ class TitlePostSerializer(serializers.ModelSerializer):
     'оценка произведения' модели Отзывов, связанных с выбранным произведением.
     Настраивает отображение для методов GET объекта модели Произведения
     с выводом имени и слага для категорий и жанров.
+    Слаги всех жанров загружаются одним запросом.
     """
-    genre = serializers.SlugRelatedField(
+    genre = CachedSlugRelatedField(
         queryset=Genre.objects.all(),
         slug_field='slug',
         write_only=True,
         many=True
     )
 
-    category = serializers.SlugRelatedField(
+    category = CachedSlugRelatedField(
         queryset=Category.objects.all(),
         slug_field='slug', write_only=True
     )
@@ -89,6 +168,91 @@ class TitlePostSerializer(serializers.ModelSerializer):
         )
         model = Title
 
+    SLUG_FIELDS = ('category', 'genre')
+
+    @staticmethod
+    def set_genres(title, genres):
+        """Связи с жанрами записываются одной вставкой."""
+        TitleGenres.objects.bulk_create(
+            TitleGenres(title=title, genre=genre)
+            for genre in dict.fromkeys(genres)
+        )
+
+    @classmethod
+    def load_slugs(cls, items, context):
+        """Загружает слаги категорий и жанров всех объектов пакета
+        в кеш контекста: один запрос на модель для всего пакета."""
+        fields = cls(context=context).fields
+        for name in cls.SLUG_FIELDS:
+            field = fields[name]
+            relation = getattr(field, 'child_relation', field)
+            slugs = []
+            for item in items:
+                value = item.get(name) if isinstance(item, dict) else None
+                slugs.extend(value if isinstance(value, list) else [value])
+            relation.load(slugs)
+
+    @classmethod
+    @transaction.atomic
+    def bulk_save(cls, created, updated):
+        """Создает и обновляет произведения пакета по проверенным данным.
+        created - список данных новых произведений, updated - пары
+        (произведение, данные). Произведения записываются массовой
+        вставкой и одним bulk_update, связи с жанрами - одной вставкой,
+        версии обновляются один раз. Возвращает созданные произведения."""
+        titles = [
+            Title(**{
+                key: value for key, value in data.items() if key != 'genre'
+            })
+            for data in created
+        ]
+        Title.objects.bulk_insert(titles)
+        fields = set()
+        for instance, data in updated:
+            for key, value in data.items():
+                if key != 'genre':
+                    setattr(instance, key, value)
+                    fields.add(key)
+        if fields:
+            Title.objects.bulk_update(
+                [instance for instance, _ in updated], fields
+            )
+        genres = [
+            *zip(titles, (data['genre'] for data in created)),
+            *(
+                (instance, data['genre'])
+                for instance, data in updated if 'genre' in data
+            ),
+        ]
+        TitleGenres.objects.filter(
+            title__in=[instance for instance, _ in genres[len(titles):]]
+        ).delete()
+        TitleGenres.objects.bulk_create(
+            TitleGenres(title=title, genre=genre)
+            for title, title_genres in genres
+            for genre in dict.fromkeys(title_genres)
+        )
+        versions.bump(
+            'titles', *(f'title:{instance.pk}' for instance, _ in updated)
+        )
+        return titles
+
+    @transaction.atomic
+    def create(self, validated_data):
+        genres = validated_data.pop('genre')
+        title = Title.objects.create(**validated_data)
+        self.set_genres(title, genres)
+        return title
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        genres = validated_data.pop('genre', None)
+        instance = super().update(instance, validated_data)
+        if genres is not None:
+            TitleGenres.objects.filter(title=instance).delete()
+            self.set_genres(instance, genres)
+        return instance
+
 
 class TitleSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Произведения.
@@ -122,16 +286,23 @@ class ReviewSerializer(serializers.ModelSerializer):
                     MaxValueValidator(SCORE_MAX_VALUE)]
     )
 
-    def validate(self, data):
-        request = self.context['request']
-        if request.method != 'POST':
-            return data
-        author = request.user
-        title_id = self.context['view'].kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        if Review.objects.filter(title=title, author=author).exists():
-            raise ValidationError(CANNOT_ADD_MORE_THAN_ONE_COMMENT)
-        return data
+    def create(self, validated_data):
+        """Отзыв записывается без предварительной проверки: повторный
+        отзыв автора отклоняет ограничение unique_review. Запрос к базе
+        для проверки причины ошибки выполняется только при отказе."""
+        try:
+            return super().create(validated_data)
+        except IntegrityError:
+            if not Review.objects.filter(
+                title=validated_data['title'],
+                author=validated_data['author'],
+            ).exists():
+                raise
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    CANNOT_ADD_MORE_THAN_ONE_COMMENT
+                ]
+            })
 
     class Meta:
         fields = ('id', 'text', 'author', 'score', 'pub_date')
@@ -30,5 +30,16 @@ auth_urls = ([
 
 urlpatterns = [
     path('v1/auth/', include(auth_urls)),
+    path('v1/metrics/', views.metrics_view, name='metrics'),
+    path(
+        'v1/profiles/<uuid:profile_id>/',
+        views.profile_view,
+        name='profile',
+    ),
+    path(
+        'v1/profiles/<uuid:profile_id>/pstats/',
+        views.profile_pstats_view,
+        name='profile_pstats',
+    ),
     path('v1/', include(router_v1.urls)),
 ]
@@ -1,18 +1,26 @@
+import json
+from functools import cached_property
+
+from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.db import IntegrityError
-from django.db.models import Avg
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, permissions, serializers, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .filters import TitleFilter
+from . import metrics
+from .filters import FullTextSearchFilter, TitleFilter
+from .mixins import ConditionalListMixin, ConditionalRetrieveMixin
+from .pagination import PubDatePagination, TitlePagination
 from .permissions import IsAdmin, IsAdminOrAuthorOrReadOnly, IsAdminOrReadOnly
 from .serializers import (
     CategorySerializer, CommentSerializer, GenreSerializer, GetTokenSerializer,
@@ -20,8 +28,19 @@ from .serializers import (
     UserSerializer,
 )
 from api_yamdb.settings import FROM_EMAIL
-from reviews.models import Category, Genre, Review, Title, User
+from reviews.models import (Category, Comment, Genre, OutgoingEmail, Review,
+                            Title, User)
+from reviews.signals import rating_updates_deferred
 
+BATCH_NOT_A_LIST = 'Ожидается список объектов.'
+BATCH_TOO_LARGE = 'Слишком много объектов в пакете, максимум {limit}.'
+BATCH_INVALID_ID = 'id должен быть целым числом.'
+BATCH_DUPLICATE_ID = 'Произведение с id {pk} уже есть в пакете.'
+BATCH_TITLE_NOT_FOUND = 'Произведение с id {pk} не найдено.'
+INVALID_IDS = 'Параметр ids должен быть списком целых чисел через запятую.'
+# Значения id, которые база данных может сравнить с целочисленным ключом.
+ID_RANGE = range(-2 ** 63, 2 ** 63)
+TOO_MANY_IDS = 'Слишком много id в параметре ids, максимум {limit}.'
 USERNAME_OR_EMAIL_UNAVAILABLE = (
     'Пользователь с таким {field_name} уже существует.'
 )
@@ -29,30 +48,47 @@ SUBJECT_LINE = 'Confirmation code'
 EMAIL_TEXT = 'Код подтверждения для получения токена: {confirmation_code}'
 
 
+def get_or_create_signup_user(username, email):
+    """Находит пользователя с такой парой имя-почта одним запросом
+    по имени или почте, создает его, если совпадений нет, и сообщает,
+    какое поле занято другим пользователем."""
+    matches = User.objects.filter(
+        Q(username=username) | Q(email=email)
+    ).order_by()[:2]
+    field_name = None
+    for user in matches:
+        if user.username == username and user.email == email:
+            return user
+        if user.username == username:
+            field_name = 'username'
+        elif field_name is None:
+            field_name = 'email'
+    if field_name is not None:
+        raise serializers.ValidationError(
+            USERNAME_OR_EMAIL_UNAVAILABLE.format(field_name=field_name)
+        )
+    return User.objects.create(username=username, email=email)
+
+
 @api_view(['POST'])
 @permission_classes((permissions.AllowAny,))
 def signup_view(request):
-    """Регистрация пользователя и отправка кода подтверждения по почте."""
+    """Регистрация пользователя и постановка письма с кодом подтверждения
+    в очередь исходящих. Письмо отправляет команда sendemails."""
     serializer = SignupSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     username = serializer.data.get('username')
     email = serializer.data.get('email')
     try:
-        user, _ = User.objects.get_or_create(username=username, email=email)
+        user = get_or_create_signup_user(username, email)
     except IntegrityError:
-        field_name = 'username' if User.objects.filter(
-            username=username
-        ).exists() else 'email'
-        raise serializers.ValidationError(
-            USERNAME_OR_EMAIL_UNAVAILABLE.format(field_name=field_name)
-        )
+        user = get_or_create_signup_user(username, email)
     confirmation_code = default_token_generator.make_token(user)
-    send_mail(
-        SUBJECT_LINE,
-        EMAIL_TEXT.format(confirmation_code=confirmation_code),
-        FROM_EMAIL,
-        [serializer.data.get('email')],
-        fail_silently=False,
+    OutgoingEmail.objects.create(
+        subject=SUBJECT_LINE,
+        body=EMAIL_TEXT.format(confirmation_code=confirmation_code),
+        from_email=FROM_EMAIL,
+        recipient=serializer.data.get('email'),
     )
     return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -78,6 +114,43 @@ def get_token(request):
     )
 
 
+@api_view(['GET'])
+@permission_classes((IsAdmin,))
+def metrics_view(request):
+    """Метрики процесса в формате Prometheus, только для администратора."""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def get_profile_path(profile_id, suffix):
+    path = settings.PROFILE_DIR / f'{profile_id.hex}.{suffix}'
+    if not path.exists():
+        raise Http404
+    return path
+
+
+@api_view(['GET'])
+@permission_classes((IsAdmin,))
+def profile_view(request, profile_id):
+    """Сводка профилирования запроса: самые долгие функции и SQL."""
+    with open(get_profile_path(profile_id, 'json')) as file:
+        summary = json.load(file)
+    summary['pstats'] = request.build_absolute_uri(
+        reverse('api:profile_pstats', args=(profile_id,))
+    )
+    return Response(summary)
+
+
+@api_view(['GET'])
+@permission_classes((IsAdmin,))
+def profile_pstats_view(request, profile_id):
+    """Файл pstats профилирования запроса."""
+    return FileResponse(
+        open(get_profile_path(profile_id, 'prof'), 'rb'),
+        as_attachment=True,
+        filename=f'{profile_id.hex}.prof',
+    )
+
+
 class UserViewSet(viewsets.ModelViewSet):
     """Просмотр профилей пользователей.
     Доступны просмотр списка всех объектов, и добавление, частичное изменение
@@ -88,7 +161,7 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = (IsAdmin,)
     lookup_field = 'username'
-    filter_backends = (SearchFilter, )
+    filter_backends = (FullTextSearchFilter, )
     search_fields = ('username', )
     http_method_names = ['get', 'post', 'head', 'patch', 'delete']
 
@@ -107,8 +180,13 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer.save(role=user.role)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic(), rating_updates_deferred():
+            instance.delete()
+
 
 class CategoryGenreViewSet(
+    ConditionalListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
@@ -120,25 +198,38 @@ class CategoryGenreViewSet(
     """
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = PageNumberPagination
-    filter_backends = (SearchFilter,)
+    filter_backends = (FullTextSearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(
+    ConditionalListMixin, ConditionalRetrieveMixin, viewsets.ModelViewSet
+):
     """Просмотр произведений.
     Доступны просмотр списка всех объектов без токена,
     добавление, частичное изменение и удаление только для администратора
     и суперюзера.
     Настроена пагинация и фильтрация по полям: слаг категории, слаг жанра,
-    название произведения и год издания.
+    название произведения и год издания, полнотекстовый поиск
+    по названию и описанию.
+    С параметром cursor пагинация идет по ключу (название, id).
+    С параметром ids=1,2,3 возвращает эти произведения списком.
     """
-    queryset = Title.objects.annotate(rating=Avg('reviews__score')).all()
+    queryset = Title.objects.with_rating().select_related(
+        'category'
+    ).prefetch_related('genre')
     serializer_class = TitleSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    pagination_class = PageNumberPagination
-    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    pagination_class = TitlePagination
+    filter_backends = (
+        DjangoFilterBackend, OrderingFilter, FullTextSearchFilter
+    )
+    search_fields = ('name', 'description')
     ordering = ('name',)
+    list_version_keys = ('titles', 'categories', 'genres')
+    detail_version_keys = ('title:{pk}', 'categories', 'genres')
+    single_flight_actions = ('retrieve',)
     filterset_class = TitleFilter
     http_method_names = ['get', 'post', 'head', 'patch', 'delete']
 
@@ -147,6 +238,138 @@ class TitleViewSet(viewsets.ModelViewSet):
             return TitlePostSerializer
         return TitleSerializer
 
+    @cached_property
+    def requested_ids(self):
+        """id из параметра ids списка без повторов, или None."""
+        ids = self.request.query_params.get('ids')
+        if self.action != 'list' or ids is None:
+            return None
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in ids.split(',')))
+        except ValueError:
+            raise serializers.ValidationError({'ids': INVALID_IDS})
+        if any(pk not in ID_RANGE for pk in ids):
+            raise serializers.ValidationError({'ids': INVALID_IDS})
+        if len(ids) > settings.TITLE_IDS_LIMIT:
+            raise serializers.ValidationError(
+                {'ids': TOO_MANY_IDS.format(limit=settings.TITLE_IDS_LIMIT)}
+            )
+        return ids
+
+    def filter_queryset(self, queryset):
+        """С параметром ids возвращает эти произведения в порядке
+        запроса без пагинации и прочих фильтров; отсутствующие id
+        пропускаются. Запросов столько же, сколько для одной страницы."""
+        if self.requested_ids is None:
+            return super().filter_queryset(queryset)
+        titles = queryset.in_bulk(self.requested_ids)
+        return [titles[pk] for pk in self.requested_ids if pk in titles]
+
+    def paginate_queryset(self, queryset):
+        if self.requested_ids is not None:
+            return None
+        return super().paginate_queryset(queryset)
+
+    @action(
+        detail=False, methods=['post'], permission_classes=(IsAdmin,)
+    )
+    def batch(self, request):
+        """Пакетное создание и обновление произведений администратором.
+        Объект без id создается, объект с id частично обновляет
+        произведение, как PATCH. Каждый объект проверяется отдельно,
+        слаги и обновляемые произведения всего пакета загружаются заранее,
+        корректные объекты записываются вместе. Результат - статус
+        и данные или ошибки для каждого объекта.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise serializers.ValidationError(BATCH_NOT_A_LIST)
+        if len(items) > settings.TITLE_BATCH_SIZE:
+            raise serializers.ValidationError(
+                BATCH_TOO_LARGE.format(limit=settings.TITLE_BATCH_SIZE)
+            )
+        context = self.get_serializer_context()
+        TitlePostSerializer.load_slugs(items, context)
+        titles = Title.objects.in_bulk({
+            item['id'] for item in items
+            if isinstance(item, dict) and self.is_batch_id(item.get('id'))
+        })
+        results, seen_ids = [], set()
+        for item in items:
+            result = self.batch_item(item, titles, seen_ids, context)
+            if not isinstance(result, dict) and not result.is_valid():
+                result = {
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': result.errors,
+                }
+            results.append(result)
+        return self.batch_response(results)
+
+    @staticmethod
+    def is_batch_id(pk):
+        return (
+            isinstance(pk, int) and not isinstance(pk, bool)
+            and pk in ID_RANGE
+        )
+
+    def batch_item(self, item, titles, seen_ids, context):
+        """Сериализатор объекта пакета или результат с ошибкой id."""
+        if not isinstance(item, dict) or 'id' not in item:
+            return TitlePostSerializer(data=item, context=context)
+        pk = item['id']
+        if not self.is_batch_id(pk):
+            error, code = BATCH_INVALID_ID, status.HTTP_400_BAD_REQUEST
+        elif pk in seen_ids:
+            error = BATCH_DUPLICATE_ID.format(pk=pk)
+            code = status.HTTP_400_BAD_REQUEST
+        elif pk not in titles:
+            error = BATCH_TITLE_NOT_FOUND.format(pk=pk)
+            code = status.HTTP_404_NOT_FOUND
+        else:
+            seen_ids.add(pk)
+            return TitlePostSerializer(
+                titles[pk], data=item, partial=True, context=context
+            )
+        return {'status': code, 'errors': {'id': [error]}}
+
+    @staticmethod
+    def batch_response(results):
+        valid = [
+            (index, result) for index, result in enumerate(results)
+            if not isinstance(result, dict)
+        ]
+        created = [item for _, item in valid if item.instance is None]
+        codes = [
+            status.HTTP_201_CREATED if item.instance is None
+            else status.HTTP_200_OK
+            for _, item in valid
+        ]
+        titles = iter(TitlePostSerializer.bulk_save(
+            [item.validated_data for item in created],
+            [
+                (item.instance, item.validated_data)
+                for _, item in valid if item.instance is not None
+            ],
+        ))
+        for item in created:
+            item.instance = next(titles)
+        for (index, item), code in zip(valid, codes):
+            results[index] = {
+                'status': code,
+                'data': TitlePostSerializer(item.instance).data,
+            }
+        if not valid:
+            return Response(results, status=status.HTTP_400_BAD_REQUEST)
+        if len(valid) < len(results):
+            return Response(results, status=status.HTTP_207_MULTI_STATUS)
+        if created:
+            return Response(results, status=status.HTTP_201_CREATED)
+        return Response(results, status=status.HTTP_200_OK)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(), rating_updates_deferred():
+            instance.delete()
+
 
 class CategoryViewSet(CategoryGenreViewSet):
     """Просмотр категорий.
@@ -156,6 +379,7 @@ class CategoryViewSet(CategoryGenreViewSet):
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    list_version_keys = ('categories',)
 
 
 class GenreViewSet(CategoryGenreViewSet):
@@ -166,31 +390,68 @@ class GenreViewSet(CategoryGenreViewSet):
     """
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    list_version_keys = ('genres',)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalListMixin, viewsets.ModelViewSet):
+    """Отзывы произведения.
+    Произведение из адреса загружается не больше одного раза за запрос
+    и используется при проверке и сохранении отзыва. Список выбирается
+    по title_id без отдельного запроса произведения; его наличие
+    проверяется, только если страница пуста.
+    """
     serializer_class = ReviewSerializer
     permission_classes = (IsAdminOrAuthorOrReadOnly,)
+    pagination_class = PubDatePagination
+    list_version_keys = ('title:{title_id}', 'users')
 
-    def get_title(self):
+    @cached_property
+    def title(self):
         return get_object_or_404(Title, id=self.kwargs.get('title_id'))
 
     def get_queryset(self):
-        return self.get_title().reviews.select_related('author')
+        return Review.objects.filter(
+            title_id=self.kwargs.get('title_id')
+        ).select_related('author')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page:
+            self.title  # 404, если произведения нет
+        return page
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, title=self.get_title())
+        serializer.save(author=self.request.user, title=self.title)
 
 
 class CommentViewSet(viewsets.ModelViewSet):
+    """Комментарии к отзыву.
+    Отзыв ищется вместе с проверкой, что он относится к произведению
+    из адреса, одним запросом за запрос к API.
+    """
     serializer_class = CommentSerializer
     permission_classes = (IsAdminOrAuthorOrReadOnly,)
+    pagination_class = PubDatePagination
 
-    def get_review(self):
-        return get_object_or_404(Review, id=self.kwargs.get('review_id'))
+    @cached_property
+    def review(self):
+        return get_object_or_404(
+            Review,
+            id=self.kwargs.get('review_id'),
+            title_id=self.kwargs.get('title_id'),
+        )
 
     def get_queryset(self):
-        return self.get_review().comments.select_related('author')
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id'),
+        ).select_related('author')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page:
+            self.review  # 404, если отзыва нет у этого произведения
+        return page
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, review=self.get_review())
+        serializer.save(author=self.request.user, review=self.review)
@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +73,42 @@ DATABASES = {
 }
 
 
+# Cache
+# Хранит версии ресурсов для условных GET-запросов и кеш ответов
+# анонимным пользователям. LocMemCache у каждого процесса свой: версия,
+# обновленная записью в одном процессе, в других остается прежней,
+# пока не истечет VERSION_TIMEOUT (секунд). С общим для всех процессов
+# кешем (Memcached, Redis) можно указать VERSION_TIMEOUT = None.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+VERSION_TIMEOUT = 30
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+STALE_RESPONSE_CACHE_TIMEOUT = 3600
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+SINGLE_FLIGHT_WAIT = 2
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+
+# Request metrics
+# Запросы сверх бюджета пишутся в лог api.performance.
+
+REQUEST_QUERY_BUDGET = 10
+REQUEST_TIME_BUDGET = 0.5
+SERVER_TIMING = DEBUG
+
+# Профилирование запросов администратором (заголовок X-Profile).
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_TOP = 30
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -115,7 +153,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
@@ -127,6 +165,14 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Наибольшее количество произведений в POST /api/v1/titles/batch/.
+TITLE_BATCH_SIZE = 1000
+# Наибольшее количество id в GET /api/v1/titles/?ids=...
+TITLE_IDS_LIMIT = 100
+
+JWT_USER_CACHE_SIZE = 1024
+JWT_USER_CACHE_TTL = 60
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
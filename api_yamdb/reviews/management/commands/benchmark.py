@@ -0,0 +1,261 @@
+import json
+from collections import Counter, defaultdict
+from math import ceil
+from random import Random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reviews.models import Comment, Genre, Review, Title, User
+from reviews.signals import rating_updates_deferred
+
+PERCENTILES = (50, 95, 99)
+# Доли операций в смеси: чтение каталога и отзывов преобладает.
+READ_MIX = (
+    ('title-list', 30),
+    ('title-list-filtered', 10),
+    ('title-detail', 25),
+    ('review-list', 15),
+    ('review-detail', 5),
+    ('comment-list', 10),
+    ('category-list', 3),
+    ('genre-list', 2),
+)
+WRITE_MIX = (
+    ('review-create', 1),
+    ('comment-create', 3),
+)
+CREATED_MODELS = {'review-create': Review, 'comment-create': Comment}
+SAMPLE_SIZE = 1000
+EMPTY_DATABASE = (
+    'Нет произведений или пользователей. Заполните базу командой '
+    'generatedata или importcsv'
+)
+
+
+def percentile(latencies, percent):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    return latencies[max(ceil(percent / 100 * len(latencies)) - 1, 0)]
+
+
+def summary(latencies, statuses):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    result = {
+        'requests': len(latencies),
+        'statuses': dict(sorted(statuses.items())),
+        'mean_ms': round(total / len(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / total, 1),
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(
+            percentile(latencies, percent) * 1000, 3
+        )
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Воспроизводит смесь запросов чтения и записи к API в этом "
+        "процессе и выводит задержки p50/p95/p99 и пропускную способность "
+        "по каждому виду запросов в формате JSON. Каждая запись "
+        "фиксируется, как в работающем сервере; созданные объекты "
+        "удаляются после замера"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Количество запросов в замере',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=50,
+            help='Количество запросов прогрева, не входящих в замер',
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.1,
+            help='Доля запросов на запись',
+        )
+        parser.add_argument(
+            '--anonymous-ratio', type=float, default=0.5,
+            help='Доля запросов чтения от анонимных пользователей',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--keep-writes', action='store_true',
+            help='Сохранить созданные во время замера отзывы и комментарии',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для результата в формате JSON, по умолчанию stdout',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = Random(options['seed'])
+        self.load_samples()
+        self.client = Client()
+        self.created = {Review: [], Comment: []}
+        try:
+            for _ in range(options['warmup']):
+                self.request()
+            result = self.run()
+        finally:
+            if not options['keep_writes']:
+                self.delete_created()
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def delete_created(self):
+        """Удаляет созданные во время замера комментарии и отзывы.
+        Рейтинг и версии произведений обновляются сигналами,
+        как при удалении через API."""
+        with transaction.atomic(), rating_updates_deferred():
+            for model in (Comment, Review):
+                model.objects.filter(id__in=self.created[model]).delete()
+
+    def load_samples(self):
+        """Выбирает из базы id объектов, к которым будут запросы."""
+        title_ids = self.sample_ids(Title)
+        user_ids = self.sample_ids(User)
+        if not title_ids or not user_ids:
+            raise CommandError(EMPTY_DATABASE)
+        self.title_ids = title_ids
+        self.reviews = list(
+            Review.objects.filter(
+                id__in=self.sample_ids(Review)
+            ).values_list('id', 'title_id')
+        )
+        self.genre_slugs = list(
+            Genre.objects.values_list('slug', flat=True)[:SAMPLE_SIZE]
+        )
+        self.tokens = [
+            f'Bearer {AccessToken.for_user(user)}'
+            for user in User.objects.filter(id__in=user_ids)
+        ]
+
+    def sample_ids(self, model):
+        """До SAMPLE_SIZE случайных существующих id без чтения всей
+        таблицы."""
+        last = model.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first()
+        if last is None:
+            return []
+        candidates = {
+            self.random.randint(1, last) for _ in range(SAMPLE_SIZE)
+        }
+        return list(
+            model.objects.filter(id__in=candidates).order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def run(self):
+        latencies = defaultdict(list)
+        statuses = defaultdict(Counter)
+        start = perf_counter()
+        for _ in range(self.options['requests']):
+            name, seconds, status = self.request()
+            latencies[name].append(seconds)
+            statuses[name][str(status)] += 1
+        wall = perf_counter() - start
+        every = [value for values in latencies.values() for value in values]
+        return {
+            'options': {
+                key: self.options[key] for key in (
+                    'requests', 'warmup', 'write_ratio', 'anonymous_ratio',
+                    'seed',
+                )
+            },
+            'wall_seconds': round(wall, 3),
+            'throughput_rps': round(len(every) / wall, 1),
+            'total': summary(every, sum(statuses.values(), Counter())),
+            'endpoints': {
+                name: summary(values, statuses[name])
+                for name, values in sorted(latencies.items())
+            },
+        }
+
+    def choose(self, mix):
+        names, weights = zip(*mix)
+        return self.random.choices(names, weights)[0]
+
+    def request(self):
+        """Выполняет один случайный запрос из смеси."""
+        write = self.random.random() < self.options['write_ratio']
+        if write and self.reviews:
+            return self.write()
+        return self.read()
+
+    def write(self):
+        name = self.choose(WRITE_MIX)
+        url, data = self.write_request(name)
+        token = self.random.choice(self.tokens)
+        start = perf_counter()
+        response = self.client.post(
+            url, data, content_type='application/json',
+            HTTP_AUTHORIZATION=token,
+        )
+        seconds = perf_counter() - start
+        if response.status_code == status.HTTP_201_CREATED:
+            self.created[CREATED_MODELS[name]].append(response.json()['id'])
+        return name, seconds, response.status_code
+
+    def read(self):
+        name = self.choose(READ_MIX)
+        url = self.read_url(name)
+        headers = {}
+        if self.random.random() >= self.options['anonymous_ratio']:
+            headers['HTTP_AUTHORIZATION'] = self.random.choice(self.tokens)
+        start = perf_counter()
+        response = self.client.get(url, **headers)
+        return name, perf_counter() - start, response.status_code
+
+    def read_url(self, name):
+        title_id = self.random.choice(self.title_ids)
+        review_id, review_title_id = (
+            self.random.choice(self.reviews) if self.reviews else (0, 0)
+        )
+        page = self.random.randint(1, 5)
+        return {
+            'title-list': f'/api/v1/titles/?page={page}',
+            'title-list-filtered': (
+                '/api/v1/titles/?genre='
+                f'{self.random.choice(self.genre_slugs or [""])}'
+            ),
+            'title-detail': f'/api/v1/titles/{title_id}/',
+            'review-list': f'/api/v1/titles/{title_id}/reviews/',
+            'review-detail': (
+                f'/api/v1/titles/{review_title_id}/reviews/{review_id}/'
+            ),
+            'comment-list': (
+                f'/api/v1/titles/{review_title_id}/reviews/{review_id}/'
+                'comments/'
+            ),
+            'category-list': '/api/v1/categories/',
+            'genre-list': '/api/v1/genres/',
+        }[name]
+
+    def write_request(self, name):
+        if name == 'review-create':
+            title_id = self.random.choice(self.title_ids)
+            return f'/api/v1/titles/{title_id}/reviews/', {
+                'text': 'Отзыв из нагрузочного теста',
+                'score': self.random.randint(1, 10),
+            }
+        review_id, title_id = self.random.choice(self.reviews)
+        return (
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/',
+            {'text': 'Комментарий из нагрузочного теста'},
+        )
@@ -0,0 +1,209 @@
+from random import Random
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reviews.models import (ROLE_ADMIN, ROLE_MODERATOR, ROLE_USER,
+                            SCORE_MAX_VALUE, SCORE_MIN_VALUE, Category,
+                            Comment, Genre, Review, Title, TitleGenres, User,
+                            current_year)
+from reviews import versions
+from reviews.signals import bulk_load_signals_disabled
+
+MODELS = (Comment, Review, TitleGenres, Title, Genre, Category, User)
+BATCH_SIZE = 1000
+ROLE_WEIGHTS = ((ROLE_USER, 98), (ROLE_MODERATOR, 1), (ROLE_ADMIN, 1))
+WORDS = (
+    'время', 'город', 'дорога', 'жизнь', 'звезда', 'игра', 'история',
+    'книга', 'легенда', 'люди', 'мечта', 'мир', 'море', 'ночь', 'огонь',
+    'остров', 'память', 'песня', 'путь', 'река', 'свет', 'сердце', 'сила',
+    'сон', 'тайна', 'тень', 'утро', 'храм', 'цвет', 'человек',
+)
+DATABASE_NOT_EMPTY = (
+    'В базе уже есть данные. Используйте --clear, чтобы удалить их '
+    'перед генерацией'
+)
+TOO_MANY_REVIEWS = (
+    'Среднее количество отзывов на произведение должно быть меньше '
+    'половины количества пользователей'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу детерминированными синтетическими данными "
+        "заданного объема для нагрузочного тестирования"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей',
+        )
+        parser.add_argument(
+            '--categories', type=int, default=10,
+            help='Количество категорий',
+        )
+        parser.add_argument(
+            '--genres', type=int, default=30,
+            help='Количество жанров',
+        )
+        parser.add_argument(
+            '--titles', type=int, default=10000,
+            help='Количество произведений',
+        )
+        parser.add_argument(
+            '--genres-per-title', type=int, default=2,
+            help='Среднее количество жанров у произведения',
+        )
+        parser.add_argument(
+            '--reviews-per-title', type=int, default=5,
+            help='Среднее количество отзывов на произведение',
+        )
+        parser.add_argument(
+            '--comments-per-review', type=int, default=1,
+            help='Среднее количество комментариев к отзыву',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество произведений, записываемых за одну порцию',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить существующие данные перед генерацией',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        if 2 * options['reviews_per_title'] > options['users']:
+            raise CommandError(TOO_MANY_REVIEWS)
+        self.random = Random(options['seed'])
+        start = perf_counter()
+        with transaction.atomic(), bulk_load_signals_disabled():
+            if options['clear']:
+                for model in MODELS:
+                    model.objects.all().delete()
+            elif any(model.objects.exists() for model in MODELS):
+                raise CommandError(DATABASE_NOT_EMPTY)
+            self.create_users()
+            self.create_named(Category, options['categories'], 'category')
+            self.create_named(Genre, options['genres'], 'genre')
+            created = self.create_titles()
+        versions.bump_catalogue()
+        seconds = perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Создано: пользователей {options["users"]}, категорий '
+                f'{options["categories"]}, жанров {options["genres"]}, '
+                f'произведений {options["titles"]}, связей с жанрами '
+                f'{created[TitleGenres]}, отзывов {created[Review]}, '
+                f'комментариев {created[Comment]} за {seconds:.2f} с'
+            )
+        )
+
+    def words(self, count):
+        return ' '.join(self.random.choice(WORDS) for _ in range(count))
+
+    def amount(self, average):
+        """Случайное количество со средним average."""
+        return self.random.randint(0, 2 * average)
+
+    def create_users(self):
+        # Пароль непригоден для входа и общий для всех пользователей.
+        password = make_password(None)
+        roles, weights = zip(*ROLE_WEIGHTS)
+        User.objects.bulk_create(
+            (
+                User(
+                    id=pk,
+                    username=f'user{pk}',
+                    email=f'user{pk}@example.com',
+                    password=password,
+                    role=self.random.choices(roles, weights)[0],
+                    bio=self.words(5),
+                )
+                for pk in range(1, self.options['users'] + 1)
+            ),
+            batch_size=self.options['batch_size'],
+        )
+
+    def create_named(self, model, count, prefix):
+        model.objects.bulk_create(
+            model(id=pk, name=self.words(2), slug=f'{prefix}-{pk}')
+            for pk in range(1, count + 1)
+        )
+
+    def create_titles(self):
+        """Создает произведения порциями вместе с их жанрами, отзывами
+        и комментариями. Сумма оценок и количество отзывов произведения
+        считаются при генерации, пересчет рейтинга не нужен."""
+        created = {TitleGenres: 0, Review: 0, Comment: 0}
+        batch_size = self.options['batch_size']
+        review_id = comment_id = 0
+        for first in range(1, self.options['titles'] + 1, batch_size):
+            last = min(first + batch_size, self.options['titles'] + 1)
+            titles, title_genres, reviews, comments = [], [], [], []
+            for pk in range(first, last):
+                title = self.title(pk)
+                titles.append(title)
+                title_genres.extend(
+                    TitleGenres(title_id=pk, genre_id=genre_id)
+                    for genre_id in self.sample(
+                        self.options['genres'],
+                        self.options['genres_per_title'],
+                    )
+                )
+                for author_id in self.sample(
+                    self.options['users'], self.options['reviews_per_title']
+                ):
+                    review_id += 1
+                    score = self.random.randint(
+                        SCORE_MIN_VALUE, SCORE_MAX_VALUE
+                    )
+                    title.score_sum += score
+                    title.review_count += 1
+                    reviews.append(Review(
+                        id=review_id, title_id=pk, author_id=author_id,
+                        score=score, text=self.words(20),
+                    ))
+                    for _ in range(
+                        self.amount(self.options['comments_per_review'])
+                    ):
+                        comment_id += 1
+                        comments.append(Comment(
+                            id=comment_id, review_id=review_id,
+                            author_id=self.random.randint(
+                                1, self.options['users']
+                            ),
+                            text=self.words(10),
+                        ))
+            for model, objects in (
+                (Title, titles), (TitleGenres, title_genres),
+                (Review, reviews), (Comment, comments),
+            ):
+                model.objects.bulk_create(objects, batch_size=batch_size)
+                created[model] = created.get(model, 0) + len(objects)
+        return created
+
+    def title(self, pk):
+        return Title(
+            id=pk,
+            name=self.words(3),
+            year=self.random.randint(1900, current_year()),
+            description=self.words(15),
+            category_id=(
+                self.random.randint(1, self.options['categories'])
+                if self.options['categories'] else None
+            ),
+        )
+
+    def sample(self, population, average):
+        """Случайные различные id от 1 до population."""
+        count = min(self.amount(average), population)
+        return self.random.sample(range(1, population + 1), count)
@@ -1,129 +1,679 @@
 import csv
+import gzip
+import io
+import json
+import os
+import resource
+import sys
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from time import perf_counter
 
-from django.core.management.base import BaseCommand
-from django.shortcuts import get_object_or_404
-from reviews.models import (Category, Comment, Genre, Review, Title,
-                            TitleGenres, User)
-
-TABLE_PATH = {
-    'Category': 'static/data/category.csv',
-    'Comment': 'static/data/comments.csv',
-    'Genre': 'static/data/genre.csv',
-    'Review': 'static/data/review.csv',
-    'Title': 'static/data/titles.csv',
-    'TitleGenres': 'static/data/genre_title.csv',
-    'User': 'static/data/users.csv',
+import django
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models.expressions import RawSQL
+from django.utils.timezone import now
+
+from reviews.models import (SCORE_MAX_VALUE, SCORE_MIN_VALUE,
+                            WRONG_MAX_SCORE_MESSAGE, WRONG_MIN_SCORE_MESSAGE,
+                            WRONG_YEAR_MESSAGE, Category, Comment, Genre,
+                            Review, Title, TitleGenres, User, current_year)
+from reviews import versions
+from reviews.signals import (bulk_load_signals_disabled,
+                             recalculate_title_ratings)
+from reviews.validators import validate_username
+
+DEFAULT_SOURCE = 'static/data'
+TABLE_FILE = {
+    'Category': 'category.csv',
+    'Comment': 'comments.csv',
+    'Genre': 'genre.csv',
+    'Review': 'review.csv',
+    'Title': 'titles.csv',
+    'TitleGenres': 'genre_title.csv',
+    'User': 'users.csv',
+}
+GZIP_SUFFIX = '.gz'
+IMPORT_ORDER = (
+    (Genre, 'Жанры'),
+    (Category, 'Категории'),
+    (Title, 'Произведения'),
+    (TitleGenres, 'Произведения-Жанры'),
+    (User, 'Пользователи'),
+    (Review, 'Отзывы'),
+    (Comment, 'Комментарии'),
+)
+UPSERT_FIELDS = {
+    Genre: ('name', 'slug'),
+    Category: ('name', 'slug'),
+    Title: ('name', 'year', 'category'),
+    TitleGenres: ('title', 'genre'),
+    User: ('username', 'email', 'role', 'bio', 'first_name', 'last_name'),
+    Review: ('title', 'text', 'author', 'score', 'pub_date'),
+    Comment: ('review', 'text', 'author', 'pub_date'),
+}
+# Даты из файла сохраняются как есть, а не заменяются временем загрузки.
+DATED_MODELS = (Review, Comment)
+# Уникальные значения, кроме id, по attname полей модели.
+UNIQUE_KEYS = {
+    Genre: (('slug',),),
+    Category: (('slug',),),
+    Title: (),
+    TitleGenres: (('title_id', 'genre_id'),),
+    User: (('username',), ('email',)),
+    Review: (('title_id', 'author_id'),),
+    Comment: (),
+}
+UPSERT_STATS = ('created', 'updated', 'unchanged', 'deleted')
+INT_COLUMNS = {
+    'Category': ('id',),
+    'Comment': ('id', 'review_id', 'author'),
+    'Genre': ('id',),
+    'Review': ('id', 'title_id', 'author', 'score'),
+    'Title': ('id', 'year', 'category'),
+    'TitleGenres': ('id', 'title_id', 'genre_id'),
+    'User': ('id',),
 }
+REJECT_COLUMNS = ('table', 'line', 'error', 'row')
+BATCH_SIZE = 5000
+DELETE_MISSING_WITHOUT_UPSERT = (
+    'Параметр --delete-missing используется только вместе с --upsert'
+)
+WRONG_INTEGER_MESSAGE = 'Поле {column} должно быть целым числом'
+MISSING_RELATION_MESSAGE = 'Ссылка на несуществующий объект'
+MISSING_COLUMNS_MESSAGE = 'В строке не хватает столбцов'
+EXTRA_COLUMNS_MESSAGE = 'В строке больше столбцов, чем в заголовке'
+DUPLICATE_MESSAGE = 'Повторяется уникальное значение {fields}: {value}'
+SOURCE_NOT_FOUND = (
+    'Источник данных не найден или не является каталогом или zip-архивом: '
+    '{source}'
+)
+TABLE_FILE_NOT_FOUND = 'В источнике {source} нет файла {filename}'
+# Временная таблица с id строк файла для --delete-missing.
+SEEN_IDS_TABLE = 'importcsv_seen_ids'
+DELETE_MISSING_SKIPPED = (
+    'Таблица {table_name}: удаление отсутствующих строк пропущено, '
+    'у отклоненных строк ({count}) не удалось определить id'
+)
+
+
+def text_stream(raw, name):
+    """Оборачивает двоичный поток в текстовый, распаковывая gzip
+    на лету, если имя файла оканчивается на .gz."""
+    if name.endswith(GZIP_SUFFIX):
+        raw = gzip.GzipFile(fileobj=raw)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+@contextmanager
+def open_table(source, filename):
+    """Открывает csv-файл таблицы из каталога или zip-архива.
+    Файл может быть сжат gzip (filename.gz). Данные читаются потоком,
+    без распаковки на диск."""
+    names = (filename, filename + GZIP_SUFFIX)
+    if os.path.isdir(source):
+        for name in names:
+            path = os.path.join(source, name)
+            if os.path.isfile(path):
+                with open(path, 'rb') as raw:
+                    yield text_stream(raw, name)
+                return
+    else:
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.namelist():
+                name = os.path.basename(member)
+                if name in names:
+                    with archive.open(member) as raw:
+                        yield text_stream(raw, name)
+                    return
+    raise CommandError(
+        TABLE_FILE_NOT_FOUND.format(source=source, filename=filename)
+    )
+
+
+def read_chunks(file, size):
+    """Читает csv-файл порциями по size строк.
+    Каждая строка возвращается вместе с номером строки файла,
+    на которой она начинается."""
+    reader = csv.DictReader(file)
+    reader.fieldnames  # читает заголовок до первой строки данных
+    chunk = []
+    line = reader.line_num + 1
+    for row in reader:
+        chunk.append((line, row))
+        line = reader.line_num + 1
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def clean_row(table, row):
+    """Приводит значения строки к нужным типам и проверяет их.
+    Не обращается к базе данных, поэтому может выполняться
+    в отдельном процессе."""
+    if None in row:
+        raise ValidationError(EXTRA_COLUMNS_MESSAGE)
+    if None in row.values():
+        raise ValidationError(MISSING_COLUMNS_MESSAGE)
+    for column in INT_COLUMNS[table]:
+        if column == 'category' and not row[column]:
+            row[column] = None
+            continue
+        try:
+            row[column] = int(row[column])
+        except (TypeError, ValueError):
+            raise ValidationError(WRONG_INTEGER_MESSAGE.format(column=column))
+    validate_values(table, row)
+    if 'pub_date' in row:
+        # Пустая дата, как и раньше, заменяется временем загрузки.
+        row['pub_date'] = Review._meta.get_field('pub_date').to_python(
+            row['pub_date'] or now()
+        )
+    return row
+
+
+def validate_values(table, row):
+    """Проверки значений, которые выполняет модель таблицы."""
+    if table == 'User':
+        validate_username(row['username'])
+    elif table == 'Review':
+        if row['score'] < SCORE_MIN_VALUE:
+            raise ValidationError(WRONG_MIN_SCORE_MESSAGE)
+        if row['score'] > SCORE_MAX_VALUE:
+            raise ValidationError(WRONG_MAX_SCORE_MESSAGE)
+    elif table == 'Title' and row['year'] > current_year():
+        raise ValidationError(WRONG_YEAR_MESSAGE)
+
+
+def clean_chunk(table, chunk):
+    """Проверяет порцию строк, разделяя ее на корректные и отклоненные."""
+    clean, rejected = [], []
+    for line, row in chunk:
+        try:
+            clean.append((line, clean_row(table, dict(row))))
+        except ValidationError as error:
+            rejected.append((line, '; '.join(error.messages), row))
+    return clean, rejected
+
+
+@contextmanager
+def file_pub_dates():
+    """Отключает auto_now_add у дат публикации на время загрузки,
+    чтобы сохранялись даты из файла."""
+    fields = [model._meta.get_field('pub_date') for model in DATED_MODELS]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def row_id(row):
+    """id строки файла или None, если его нельзя разобрать."""
+    try:
+        return int(row.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def peak_memory():
+    """Пиковый размер резидентной памяти процесса в байтах.
+    В отличие от tracemalloc не замедляет выделение памяти."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def imap_bounded(executor, func, iterable, window):
+    """Аналог executor.map, который держит в работе не больше window
+    задач, чтобы не читать весь файл в память заранее."""
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
 
 class Command(BaseCommand):
     help = "Заполняет базу данных из файлов csv"
 
-    def sucsess_import_message(self, table_name):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            nargs='?',
+            default=DEFAULT_SOURCE,
+            help='Каталог с файлами csv или csv.gz, либо zip-архив с ними',
+        )
+        parser.add_argument(
+            '--tables',
+            nargs='+',
+            choices=[model.__name__.lower() for model, _ in IMPORT_ORDER],
+            help='Загрузить только перечисленные таблицы',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одной порции загрузки',
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help=(
+                'Не очищать таблицы: добавить новые строки и обновить '
+                'изменившиеся'
+            ),
+        )
+        parser.add_argument(
+            '--delete-missing',
+            action='store_true',
+            help='В режиме --upsert удалить строки, которых нет в файлах',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help=(
+                'Количество процессов для разбора и проверки строк; '
+                'запись в базу всегда выполняет один процесс'
+            ),
+        )
+        parser.add_argument(
+            '--rejects',
+            default='rejects.csv',
+            help='Файл для отклоненных строк с номерами строк и причинами',
+        )
+
+    def sucsess_import_message(self, table_name, rows, seconds, peak):
         self.stdout.write(
             self.style.SUCCESS(
-                f'Данные таблицы {table_name} успешно импортированы'
+                f'Данные таблицы {table_name} успешно импортированы: '
+                f'{rows} строк за {seconds:.2f} с '
+                f'({rows / max(seconds, 1e-6):.0f} строк/с), '
+                f'пик памяти процесса {peak / 2 ** 20:.1f} МБ'
+            )
+        )
+
+    def upsert_message(self, table_name, stats):
+        self.stdout.write(
+            f'Таблица {table_name}: добавлено {stats["created"]}, '
+            f'обновлено {stats["updated"]}, без изменений '
+            f'{stats["unchanged"]}, удалено {stats["deleted"]}'
+        )
+
+    def rejected_rows_message(self, table_name, rejected):
+        self.stdout.write(
+            self.style.WARNING(
+                f'Таблица {table_name}: отклонено строк: {rejected}, '
+                f'подробности в файле {self.rejects_path}'
             )
         )
 
     def handle(self, *args, **options):
-        with open(TABLE_PATH['Genre'], encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            Genre.objects.all().delete()
-            for row in reader:
-                genre = Genre(
-                    id=row[0],
-                    name=row[1],
-                    slug=row[2])
-                genre.save()
-        self.sucsess_import_message('Жанры')
-
-        with open(TABLE_PATH['Category'], encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            Category.objects.all().delete()
-            for row in reader:
-                category = Category(
-                    id=row[0],
-                    name=row[1],
-                    slug=row[2])
-                category.save()
-        self.sucsess_import_message('Категории')
-
-        with open(TABLE_PATH['Title'], encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            Title.objects.all().delete()
-            for row in reader:
-                category = get_object_or_404(Category, id=int(row[3]))
-                title = Title(
-                    id=row[0],
-                    name=row[1],
-                    year=row[2],
-                    category=category)
-                title.save()
-        self.sucsess_import_message('Произведения')
-
-        with open(TABLE_PATH['TitleGenres'], encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            TitleGenres.objects.all().delete()
-            for row in reader:
-                title = get_object_or_404(Title, id=row[1])
-                genre = get_object_or_404(Genre, id=row[-1])
-                title_genre = TitleGenres(
-                    id=row[0],
-                    title=title,
-                    genre=genre)
-                title_genre.save()
-        self.sucsess_import_message('Произведения-Жанры')
-
-        with open(TABLE_PATH['User'], encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            User.objects.all().delete()
-            for row in reader:
-                user = User(
-                    id=row[0],
-                    username=row[1],
-                    email=row[2],
-                    role=row[3],
-                    bio=row[4],
-                    first_name=row[5],
-                    last_name=row[6])
-                user.save()
-        self.sucsess_import_message('Пользователи')
-
-        with open(TABLE_PATH['Review'], encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            Review.objects.all().delete()
-            for row in reader:
-                title = get_object_or_404(Title, id=row[1])
-                author = get_object_or_404(User, id=row[3])
-                review = Review(
-                    id=row[0],
-                    title=title,
-                    text=row[2],
-                    author=author,
-                    score=row[4],
-                    pub_date=row[5])
-                review.save()
-        self.sucsess_import_message('Отзывы')
-
-        with open(TABLE_PATH['Comment'], encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            Comment.objects.all().delete()
-            for row in reader:
-                review = get_object_or_404(Review, id=row[1])
-                author = get_object_or_404(User, id=row[3])
-                comment = Comment(
-                    id=row[0],
-                    review=review,
-                    text=row[2],
-                    author=author,
-                    pub_date=row[4])
-                comment.save()
-        self.sucsess_import_message('Комментарии')
+        self.source = options['source']
+        if not (
+            os.path.isdir(self.source) or zipfile.is_zipfile(self.source)
+        ):
+            raise CommandError(SOURCE_NOT_FOUND.format(source=self.source))
+        self.tables = [
+            (model, table_name) for model, table_name in IMPORT_ORDER
+            if options['tables'] is None
+            or model.__name__.lower() in options['tables']
+        ]
+        self.batch_size = options['batch_size']
+        self.upsert = options['upsert']
+        self.delete_missing = options['delete_missing']
+        if self.delete_missing and not self.upsert:
+            raise CommandError(DELETE_MISSING_WITHOUT_UPSERT)
+        self.known_ids = {}
+        self.rejects_path = options['rejects']
+        self.rejects_file = self.rejects_writer = None
+        self.workers = options['workers']
+        self.executor = None
+        if self.workers > 1:
+            connections.close_all()
+            self.executor = ProcessPoolExecutor(
+                self.workers, initializer=django.setup
+            )
+        try:
+            with file_pub_dates():
+                self.load()
+        finally:
+            versions.bump_catalogue()
+            if self.executor is not None:
+                self.executor.shutdown()
+            if self.rejects_file is not None:
+                self.rejects_file.close()
+
+    def load(self):
+        if self.upsert:
+            self.import_tables()
+        else:
+            with bulk_load_signals_disabled():
+                self.delete_tables()
+                self.import_tables()
+
+    def delete_tables(self):
+        """Очищает загружаемые таблицы. Если вместе с ними удаляются
+        отзывы, рейтинг всех произведений обнуляется и затем
+        пересчитывается по загруженным отзывам."""
+        models = [model for model, _ in self.tables]
+        for model in reversed(models):
+            model.objects.all().delete()
+        if Review in models or User in models:
+            Title.objects.update(score_sum=0, review_count=0)
+
+    def import_tables(self):
+        for model, table_name in self.tables:
+            self.import_table(model, table_name)
+
+    def ids(self, model):
+        """Множество id модели, загружается из базы один раз."""
+        if model not in self.known_ids:
+            self.known_ids[model] = set(
+                model.objects.values_list('id', flat=True)
+            )
+        return self.known_ids[model]
+
+    def reject(self, table, line, error, row):
+        if self.rejects_writer is None:
+            self.rejects_file = open(
+                self.rejects_path, 'w', encoding='utf-8', newline=''
+            )
+            self.rejects_writer = csv.writer(self.rejects_file)
+            self.rejects_writer.writerow(REJECT_COLUMNS)
+        self.rejects_writer.writerow((
+            table, line, error,
+            json.dumps(row, ensure_ascii=False, default=str),
+        ))
+
+    def clean_chunks(self, table):
+        """Разбирает и проверяет файл таблицы порциями: в пуле процессов,
+        если он задан, иначе в текущем процессе. Отклоненные строки
+        записываются в файл, корректные возвращаются в порядке файла
+        вместе с отклоненными."""
+        with open_table(self.source, TABLE_FILE[table]) as file:
+            chunks = read_chunks(file, self.batch_size)
+            clean = partial(clean_chunk, table)
+            if self.executor is None:
+                results = map(clean, chunks)
+            else:
+                results = imap_bounded(
+                    self.executor, clean, chunks, self.workers * 2
+                )
+            for rows, rejected in results:
+                for line, error, row in rejected:
+                    self.reject(table, line, error, row)
+                yield rows, [row for _, _, row in rejected]
+
+    @transaction.atomic
+    def import_table(self, model, table_name):
+        started = perf_counter()
+        table = model.__name__
+        rows = rejected = 0
+        stats = dict.fromkeys(UPSERT_STATS, 0)
+        unknown_ids = 0
+        if self.delete_missing:
+            self.create_seen_ids()
+        self.touched_titles = set()
+        for chunk, chunk_rejected in self.clean_chunks(table):
+            rejected += len(chunk_rejected)
+            if self.delete_missing:
+                # id всех строк файла, включая отклоненные: строки
+                # с ошибками не должны считаться удаленными из файла.
+                chunk_ids = [row_id(row) for row in chunk_rejected]
+                unknown_ids += chunk_ids.count(None)
+                self.stage_seen_ids([
+                    *(pk for pk in chunk_ids if pk is not None),
+                    *(row['id'] for _, row in chunk),
+                ])
+            objects = self.build_objects(model, chunk)
+            rejected += len(chunk) - len(objects)
+            self.write_objects(model, objects, stats)
+            rows += len(objects)
+        if self.delete_missing:
+            stats['deleted'] = self.delete_missing_objects(
+                model, table_name, unknown_ids
+            )
+        if self.touched_titles:
+            recalculate_title_ratings(self.touched_titles, self.batch_size)
+        self.known_ids.pop(model, None)
+        if rejected:
+            self.rejected_rows_message(table_name, rejected)
+        if self.upsert:
+            self.upsert_message(table_name, stats)
+        self.sucsess_import_message(
+            table_name, rows, perf_counter() - started,
+            peak_memory()
+        )
+
+    def build_objects(self, model, chunk):
+        """Создает объекты порции, отклоняя строки со ссылками
+        на несуществующие объекты и повторами уникальных значений."""
+        table = model.__name__
+        build = getattr(self, f'build_{table.lower()}')
+        built = []
+        for line, row in chunk:
+            obj = build(row)
+            if obj is None:
+                self.reject(table, line, MISSING_RELATION_MESSAGE, row)
+                continue
+            built.append((line, row, obj))
+        keys = (('id',), *UNIQUE_KEYS[model])
+        taken = self.taken_unique_values(model, keys, built)
+        seen = {key: set() for key in keys}
+        objects = []
+        for line, row, obj in built:
+            error = self.duplicate_error(obj, seen, taken)
+            if error:
+                self.reject(table, line, error, row)
+                continue
+            objects.append(obj)
+        return objects
+
+    def taken_unique_values(self, model, keys, built):
+        """Значения ключей порции, которые уже есть в базе: id объекта,
+        которому значение принадлежит, одним запросом на ключ.
+        Строки предыдущих порций к этому моменту уже записаны, поэтому
+        повторы в файле находятся без хранения значений всего файла.
+        Существующий id - повтор только без --upsert (там это обновление);
+        такому значению сопоставлен None, т.е. чужой объект."""
+        taken = {}
+        for key in keys:
+            if key == ('id',) and self.upsert:
+                continue
+            existing = model.objects.filter(**{
+                f'{key[0]}__in': {getattr(obj, key[0]) for _, _, obj in built}
+            }).values_list('id', *key)
+            taken[key] = {
+                tuple(row[1:]): None if key == ('id',) else row[0]
+                for row in existing
+            }
+        return taken
+
+    @staticmethod
+    def duplicate_error(obj, seen, taken):
+        """Ошибка, если значение уникального ключа объекта уже
+        встречалось в порции или занято в базе другим объектом.
+        Иначе запоминает значения объекта в seen и возвращает None."""
+        values = {
+            key: tuple(getattr(obj, attname) for attname in key)
+            for key in seen
+        }
+        for key, value in values.items():
+            if value in seen[key] or (
+                taken.get(key, {}).get(value, obj.id) != obj.id
+            ):
+                return DUPLICATE_MESSAGE.format(
+                    fields=', '.join(key), value=', '.join(map(str, value))
+                )
+        for key, value in values.items():
+            seen[key].add(value)
+        return None
+
+    def write_objects(self, model, objects, stats):
+        if self.upsert:
+            self.upsert_objects(model, objects, stats)
+            return
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        if model is Review:
+            self.touched_titles.update(obj.title_id for obj in objects)
+
+    @staticmethod
+    def normalized(fields, values):
+        """Значения строки, приведенные к типам полей."""
+        return tuple(
+            field.to_python(value) for field, value in zip(fields, values)
+        )
+
+    def upsert_objects(self, model, objects, stats):
+        """Добавляет новые и обновляет изменившиеся объекты порции.
+        Существующие строки выбираются одним запросом по id и сравниваются
+        с входящими по значениям, приведенным к типам полей."""
+        fields = [model._meta.get_field(name) for name in UPSERT_FIELDS[model]]
+        attnames = [field.attname for field in fields]
+        existing = {
+            row[0]: row[1:]
+            for row in model.objects.filter(
+                id__in=[obj.id for obj in objects]
+            ).values_list('id', *attnames)
+        }
+        created, updated = [], []
+        for obj in objects:
+            if obj.id not in existing:
+                created.append(obj)
+                continue
+            old = existing[obj.id]
+            new = [getattr(obj, attname) for attname in attnames]
+            if self.normalized(fields, old) == self.normalized(fields, new):
+                continue
+            updated.append(obj)
+            if model is Review:
+                self.touched_titles.add(old[attnames.index('title_id')])
+        model.objects.bulk_create(created, batch_size=self.batch_size)
+        model.objects.bulk_update(
+            updated, UPSERT_FIELDS[model], batch_size=self.batch_size
+        )
+        if model is Review:
+            self.touched_titles.update(
+                obj.title_id for obj in created + updated
+            )
+        stats['created'] += len(created)
+        stats['updated'] += len(updated)
+        stats['unchanged'] += len(objects) - len(created) - len(updated)
+
+    def create_seen_ids(self):
+        """Создает пустую временную таблицу id строк файла. id хранятся
+        в базе, а не в памяти, чтобы память не росла с размером файла."""
+        table = connection.ops.quote_name(SEEN_IDS_TABLE)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} (id bigint)')
+            cursor.execute(
+                f'CREATE INDEX {SEEN_IDS_TABLE}_id ON {table} (id)'
+            )
+
+    def stage_seen_ids(self, ids):
+        table = connection.ops.quote_name(SEEN_IDS_TABLE)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (id) VALUES (%s)', [(pk,) for pk in ids]
+            )
+
+    def delete_missing_objects(self, model, table_name, unknown_ids):
+        """Удаляет порциями объекты, id которых нет во временной таблице
+        id строк файла. Если у части отклоненных строк id не разобран,
+        ничего не удаляет: такие строки нельзя отличить от удаленных."""
+        table = connection.ops.quote_name(SEEN_IDS_TABLE)
+        try:
+            if unknown_ids:
+                self.stdout.write(self.style.WARNING(
+                    DELETE_MISSING_SKIPPED.format(
+                        table_name=table_name, count=unknown_ids
+                    )
+                ))
+                return 0
+            missing = model.objects.exclude(
+                id__in=RawSQL(f'SELECT id FROM {table}', ())
+            ).order_by().values_list('id', flat=True)
+            deleted = 0
+            while True:
+                batch = list(missing[:self.batch_size])
+                if not batch:
+                    return deleted
+                model.objects.filter(id__in=batch).delete()
+                deleted += len(batch)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {table}')
+
+    def build_genre(self, row):
+        return Genre(id=row['id'], name=row['name'], slug=row['slug'])
+
+    def build_category(self, row):
+        return Category(id=row['id'], name=row['name'], slug=row['slug'])
+
+    def build_title(self, row):
+        category_id = row['category']
+        if category_id is not None and category_id not in self.ids(Category):
+            return None
+        return Title(
+            id=row['id'],
+            name=row['name'],
+            year=row['year'],
+            category_id=category_id)
+
+    def build_titlegenres(self, row):
+        title_id = row['title_id']
+        genre_id = row['genre_id']
+        if title_id not in self.ids(Title) or genre_id not in self.ids(Genre):
+            return None
+        return TitleGenres(id=row['id'], title_id=title_id, genre_id=genre_id)
+
+    def build_user(self, row):
+        return User(
+            id=row['id'],
+            username=row['username'],
+            email=row['email'],
+            role=row['role'],
+            bio=row['bio'],
+            first_name=row['first_name'],
+            last_name=row['last_name'])
+
+    def build_review(self, row):
+        title_id = row['title_id']
+        author_id = row['author']
+        if title_id not in self.ids(Title) or author_id not in self.ids(User):
+            return None
+        return Review(
+            id=row['id'],
+            title_id=title_id,
+            text=row['text'],
+            author_id=author_id,
+            score=row['score'],
+            pub_date=row['pub_date'])
+
+    def build_comment(self, row):
+        review_id = row['review_id']
+        author_id = row['author']
+        if (
+            review_id not in self.ids(Review)
+            or author_id not in self.ids(User)
+        ):
+            return None
+        return Comment(
+            id=row['id'],
+            review_id=review_id,
+            text=row['text'],
+            author_id=author_id,
+            pub_date=row['pub_date'])
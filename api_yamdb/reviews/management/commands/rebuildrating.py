@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from reviews.models import Review, Title
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает сумму оценок и количество отзывов произведений "
+        "и сообщает о расхождениях с сохраненными значениями"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сообщить о расхождениях, не изменяя данные',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        totals = {
+            row['title']: (row['score_sum'], row['review_count'])
+            for row in Review.objects.values('title').annotate(
+                score_sum=Sum('score'), review_count=Count('id')
+            ).order_by()
+        }
+        drifted = []
+        titles = Title.objects.only(
+            'id', 'name', 'score_sum', 'review_count'
+        ).order_by('id')
+        for title in titles.iterator(chunk_size=BATCH_SIZE):
+            score_sum, review_count = totals.get(title.id, (0, 0))
+            if (title.score_sum, title.review_count) == (
+                score_sum, review_count
+            ):
+                continue
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Произведение {title.id} ({title.name}): '
+                    f'сумма оценок {title.score_sum} -> {score_sum}, '
+                    f'отзывов {title.review_count} -> {review_count}'
+                )
+            )
+            title.score_sum = score_sum
+            title.review_count = review_count
+            drifted.append(title)
+        if drifted and not options['check']:
+            Title.objects.bulk_update(
+                drifted, ('score_sum', 'review_count'), batch_size=BATCH_SIZE
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Проверено произведений: {titles.count()}, '
+                f'с расхождениями: {len(drifted)}'
+            )
+        )
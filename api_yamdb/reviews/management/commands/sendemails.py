@@ -0,0 +1,186 @@
+from datetime import timedelta
+from time import sleep
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from reviews.models import OutgoingEmail
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 60
+INTERVAL_SECONDS = 5
+LEASE_SECONDS = 300
+UPDATE_FIELDS = ('attempts', 'send_after', 'sent_at', 'last_error')
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправляет письма из очереди исходящих порциями через одно "
+        "соединение с почтовым сервером, с повторными попытками"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество писем, выбираемых из очереди за один раз',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help='Количество попыток отправки одного письма',
+        )
+        parser.add_argument(
+            '--backoff',
+            type=int,
+            default=BACKOFF_SECONDS,
+            help=(
+                'Задержка перед повторной попыткой в секундах, '
+                'удваивается с каждой неудачей'
+            ),
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=LEASE_SECONDS,
+            help=(
+                'На сколько секунд выбранная порция откладывается для других '
+                'процессов на время отправки'
+            ),
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а проверять очередь каждые --interval с',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=INTERVAL_SECONDS,
+            help='Пауза между проверками очереди в режиме --loop',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        while True:
+            sent, failed, latencies = self.drain()
+            if sent or failed or not options['loop']:
+                self.stats_message(sent, failed, latencies)
+            if not options['loop']:
+                return
+            sleep(options['interval'])
+
+    def stats_message(self, sent, failed, latencies):
+        pending = OutgoingEmail.objects.pending(self.options['max_attempts'])
+        latency = (
+            sum(latencies, timedelta()) / len(latencies)
+            if latencies else timedelta()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Отправлено писем: {sent}, неудачных попыток: {failed}, '
+                f'в очереди: {pending.count()}, средняя задержка '
+                f'отправки: {latency.total_seconds():.1f} с'
+            )
+        )
+
+    def drain(self):
+        """Отправляет все письма, которые пора отправить, порциями.
+        Соединение с почтовым сервером открывается один раз и только
+        если в очереди есть письма. Письма отправляются вне транзакции:
+        порция сначала занимается короткой транзакцией, результат
+        записывается второй, и медленный почтовый сервер не блокирует
+        запись в базу (в SQLite - всю базу). Если сервер недоступен,
+        порции засчитывается неудачная попытка."""
+        sent = failed = 0
+        latencies = []
+        connection = None
+        try:
+            while True:
+                batch = self.claim()
+                if not batch:
+                    break
+                if connection is None:
+                    connection = self.connect(batch)
+                    if connection is None:
+                        failed += len(batch)
+                        break
+                for message in batch:
+                    if self.send(connection, message):
+                        sent += 1
+                        latencies.append(message.sent_at - message.created_at)
+                    else:
+                        failed += 1
+                OutgoingEmail.objects.bulk_update(batch, UPDATE_FIELDS)
+        finally:
+            if connection is not None:
+                connection.close()
+        return sent, failed, latencies
+
+    def claim(self):
+        """Выбирает порцию писем, которые пора отправить, и откладывает
+        их на --lease секунд, чтобы другой процесс их не выбрал, а после
+        сбоя этого процесса они были отправлены повторно. Строки
+        выбираются с SELECT ... FOR UPDATE SKIP LOCKED; SQLite блокировку
+        строк не поддерживает, с ней должен работать один процесс."""
+        with transaction.atomic():
+            batch = list(
+                OutgoingEmail.objects.due(
+                    self.options['max_attempts']
+                ).select_for_update(
+                    skip_locked=True
+                )[:self.options['batch_size']]
+            )
+            if batch:
+                OutgoingEmail.objects.filter(
+                    id__in=[message.id for message in batch]
+                ).update(
+                    send_after=now() + timedelta(
+                        seconds=self.options['lease']
+                    )
+                )
+        return batch
+
+    def connect(self, batch):
+        """Открывает соединение с почтовым сервером. Если это не удалось,
+        записывает неудачную попытку всем письмам порции и возвращает
+        None, не прерывая работу в режиме --loop."""
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as error:
+            for message in batch:
+                self.fail(message, error)
+            OutgoingEmail.objects.bulk_update(batch, UPDATE_FIELDS)
+            self.stderr.write(f'Почтовый сервер недоступен: {error}')
+            return None
+        return connection
+
+    def fail(self, message, error):
+        message.attempts += 1
+        message.last_error = str(error)
+        message.send_after = now() + timedelta(
+            seconds=self.options['backoff'] * 2 ** (message.attempts - 1)
+        )
+
+    def send(self, connection, message):
+        try:
+            EmailMessage(
+                message.subject,
+                message.body,
+                message.from_email,
+                [message.recipient],
+                connection=connection,
+            ).send()
+        except Exception as error:
+            self.fail(message, error)
+            return False
+        message.attempts += 1
+        message.sent_at = now()
+        message.last_error = ''
+        return True
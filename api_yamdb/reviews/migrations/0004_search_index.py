@@ -0,0 +1,62 @@
+from django.db import migrations
+
+SEARCH_INDEXES = {
+    'reviews_title': ('name', 'description'),
+    'reviews_category': ('name',),
+    'reviews_genre': ('name',),
+    'reviews_user': ('username',),
+}
+TOKENIZE = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+
+def index_sql(table, columns):
+    fts = f'{table}_fts'
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    delete = (
+        f"INSERT INTO {fts}({fts}, rowid, {names}) "
+        f"VALUES ('delete', old.id, {old});"
+    )
+    insert = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});'
+    return (
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, "
+        f"content='{table}', content_rowid='id', {TOKENIZE});",
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} '
+        f'BEGIN {insert} END;',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} '
+        f'BEGIN {delete} END;',
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {table} '
+        f'BEGIN {delete} {insert} END;',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild');",
+    )
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in SEARCH_INDEXES.items():
+        for sql in index_sql(table, columns):
+            schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in SEARCH_INDEXES:
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(
+                f'DROP TRIGGER IF EXISTS {table}_fts_{suffix};'
+            )
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Case, F, When
 from django.utils.timezone import now
 
 from .validators import validate_username
@@ -22,6 +23,8 @@ WRONG_MIN_SCORE_MESSAGE = ('Оценка должна быть больше ил
                            f'{SCORE_MIN_VALUE}')
 WRONG_MAX_SCORE_MESSAGE = ('Оценка должна быть меньше или равна '
                            f'{SCORE_MAX_VALUE}')
+SUBJECT_LENGTH = 255
+RATING_FIELDS = ('score_sum', 'review_count')
 
 
 ROLE_CHOICES = (
@@ -134,12 +137,68 @@ class Genre(NameSlug):
         verbose_name_plural = 'Жанры'
 
 
+class TitleQuerySet(models.QuerySet):
+    """Набор запросов для модели Произведения."""
+
+    def with_rating(self):
+        """Добавляет поле рейтинг, рассчитанное по сохраненным в
+        произведении сумме оценок и количеству отзывов, без обращения
+        к таблице отзывов. Если отзывов нет - рейтинг равен None."""
+        return self.annotate(
+            rating=Case(
+                When(review_count=0, then=None),
+                default=F('score_sum') / F('review_count'),
+                output_field=models.IntegerField(),
+            )
+        )
+
+    def bulk_insert(self, titles):
+        """Записывает новые произведения одной массовой вставкой
+        и проставляет им id. Если база не возвращает id из вставки,
+        а это SQLite, id резервируются заранее в той же транзакции;
+        в остальных базах произведения записываются по одному."""
+        if not titles:
+            return
+        connection = connections[self.db]
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.bulk_create(titles)
+        elif connection.vendor == 'sqlite':
+            first = self.reserve_sqlite_ids(len(titles))
+            for pk, title in enumerate(titles, first):
+                title.pk = pk
+            self.bulk_create(titles)
+        else:
+            for title in titles:
+                title.save(using=self.db)
+
+    def reserve_sqlite_ids(self, count):
+        """Резервирует count последовательных id в текущей транзакции
+        SQLite и возвращает первый из них. Пустой UPDATE берет блокировку
+        записи до конца транзакции, поэтому id после наибольшего не займет
+        другой процесс. Учитывается sqlite_sequence, чтобы не повторять id
+        удаленных объектов (AUTOINCREMENT)."""
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        pk = connection.ops.quote_name(self.model._meta.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET {pk} = {pk} WHERE 0')
+            cursor.execute(
+                f'SELECT MAX(COALESCE((SELECT MAX({pk}) FROM {table}), 0), '
+                'COALESCE((SELECT seq FROM sqlite_sequence '
+                'WHERE name = %s), 0))',
+                [self.model._meta.db_table],
+            )
+            return cursor.fetchone()[0] + 1
+
+
 class Title(models.Model):
     """
     Модель произведения.
     Содержит данные о названии произведения и годе публикации.
     Опциональные поля: описание, категория и жанр.
     Категория у произведения может быть только одна, а жанров несколько.
+    Сумма оценок и количество отзывов хранятся в самом произведении
+    и обновляются при изменении отзывов.
     """
     name = models.CharField(
         max_length=NAME_LENGTH,
@@ -168,10 +227,37 @@ class Title(models.Model):
         related_name='titles',
         verbose_name='Жанр',
     )
+    score_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Сумма оценок',
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество отзывов',
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """Сохранение существующего произведения не перезаписывает сумму
+        оценок и количество отзывов: их меняют только запросы UPDATE
+        с F(), и отзыв, добавленный после загрузки произведения,
+        не теряется."""
+        if update_fields is None and not force_insert and not (
+            self._state.adding
+        ):
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_FIELDS
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
     class Meta(NameSlug.Meta):
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
@@ -212,6 +298,13 @@ class TextAuthorPubdateModel(models.Model):
         abstract = True
         ordering = ('-pub_date',)
         default_related_name = '%(class)ss'
+        # Лента отзывов и комментариев пользователя.
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='%(class)s_author_pub_date',
+            ),
+        )
 
     def __str__(self):
         return self.text[:OUTPUT_LENGTH]
@@ -239,9 +332,32 @@ class Review(TextAuthorPubdateModel):
         default=1,
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating_values = (
+            instance.__dict__.get('title_id'),
+            instance.__dict__.get('score'),
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Сохранение отзыва и пересчет рейтинга произведения
+        выполняются в одной транзакции."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta(TextAuthorPubdateModel.Meta):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
+        # Отзывы произведения в порядке пагинации без сортировки.
+        indexes = (
+            *TextAuthorPubdateModel.Meta.indexes,
+            models.Index(
+                fields=('title', '-pub_date', '-id'),
+                name='review_title_pub_date',
+            ),
+        )
         constraints = [
             models.UniqueConstraint(
                 fields=('title', 'author'), name='unique_review'
@@ -261,3 +377,68 @@ class Comment(TextAuthorPubdateModel):
     class Meta(TextAuthorPubdateModel.Meta):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            *TextAuthorPubdateModel.Meta.indexes,
+            models.Index(
+                fields=('review', '-pub_date', '-id'),
+                name='comment_review_pub_date',
+            ),
+        )
+
+
+class OutgoingEmailQuerySet(models.QuerySet):
+    """Набор запросов для очереди исходящих писем."""
+
+    def pending(self, max_attempts):
+        """Неотправленные письма, для которых не исчерпаны попытки."""
+        return self.filter(sent_at__isnull=True, attempts__lt=max_attempts)
+
+    def due(self, max_attempts):
+        """Письма, которые пора отправить, в порядке очереди."""
+        return self.pending(max_attempts).filter(
+            send_after__lte=now()
+        ).order_by('send_after', 'id')
+
+
+class OutgoingEmail(models.Model):
+    """Модель исходящего письма.
+    Письмо записывается в базу при обработке запроса и отправляется
+    позже командой sendemails. Хранит число попыток отправки, время
+    следующей попытки и текст последней ошибки.
+    """
+    recipient = models.EmailField(
+        max_length=EMAIL_LENGTH, verbose_name='Получатель'
+    )
+    from_email = models.EmailField(
+        max_length=EMAIL_LENGTH, verbose_name='Отправитель'
+    )
+    subject = models.CharField(max_length=SUBJECT_LENGTH, verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст')
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата добавления'
+    )
+    send_after = models.DateTimeField(
+        default=now, verbose_name='Отправить не раньше'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток отправки'
+    )
+    sent_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Дата отправки'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    objects = OutgoingEmailQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('send_after',)
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(
+                fields=('sent_at', 'send_after'), name='outgoing_email_queue'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject[:OUTPUT_LENGTH]}'
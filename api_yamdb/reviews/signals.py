@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+from threading import local
+
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import versions
+from .models import Category, Genre, Review, Title, TitleGenres, User
+
+RATING_BATCH_SIZE = 500
+
+deferred_ratings = local()
+
+
+def change_title_rating(title_id, score, count):
+    """Атомарно изменяет сумму оценок и количество отзывов произведения."""
+    Title.objects.filter(pk=title_id).update(
+        score_sum=F('score_sum') + score,
+        review_count=F('review_count') + count,
+    )
+
+
+def recalculate_title_rating(title_id):
+    """Пересчитывает рейтинг произведения по всем его отзывам."""
+    recalculate_title_ratings((title_id,))
+
+
+def recalculate_title_ratings(title_ids, batch_size=RATING_BATCH_SIZE):
+    """Пересчитывает рейтинг произведений по их отзывам порциями."""
+    title_ids = sorted(title_ids)
+    for start in range(0, len(title_ids), batch_size):
+        batch = title_ids[start:start + batch_size]
+        totals = {
+            row['title']: (row['score_sum'], row['review_count'])
+            for row in Review.objects.filter(title_id__in=batch).values(
+                'title'
+            ).annotate(
+                score_sum=Sum('score'), review_count=Count('id')
+            ).order_by()
+        }
+        Title.objects.bulk_update(
+            [
+                Title(
+                    id=title_id,
+                    score_sum=totals.get(title_id, (0, 0))[0],
+                    review_count=totals.get(title_id, (0, 0))[1],
+                )
+                for title_id in batch
+            ],
+            ('score_sum', 'review_count'),
+        )
+
+
+@contextmanager
+def rating_updates_deferred():
+    """Откладывает пересчет рейтинга при удалении отзывов до конца блока.
+    Каскадное удаление произведения или пользователя удаляет отзывы
+    по одному сигналу на отзыв; вместо запроса на каждый отзыв рейтинг
+    затронутых произведений пересчитывается одним пакетом."""
+    if getattr(deferred_ratings, 'title_ids', None) is not None:
+        yield
+        return
+    deferred_ratings.title_ids = set()
+    try:
+        yield
+        title_ids = deferred_ratings.title_ids
+    finally:
+        deferred_ratings.title_ids = None
+    if title_ids:
+        recalculate_title_ratings(title_ids)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    """Учитывает новый или измененный отзыв в рейтинге произведения."""
+    if raw:
+        return
+    old_title_id, old_score = getattr(
+        instance, '_loaded_rating_values', (None, None)
+    )
+    if created:
+        change_title_rating(instance.title_id, instance.score, 1)
+    elif old_title_id is None:
+        recalculate_title_rating(instance.title_id)
+    elif old_title_id != instance.title_id:
+        change_title_rating(old_title_id, -old_score, -1)
+        change_title_rating(instance.title_id, instance.score, 1)
+    elif old_score != instance.score:
+        change_title_rating(instance.title_id, instance.score - old_score, 0)
+    instance._loaded_rating_values = (instance.title_id, instance.score)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """Исключает удаленный отзыв из рейтинга произведения."""
+    title_ids = getattr(deferred_ratings, 'title_ids', None)
+    if title_ids is not None:
+        title_ids.add(instance.title_id)
+    else:
+        change_title_rating(instance.title_id, -instance.score, -1)
+
+
+@receiver((post_save, post_delete), sender=Category)
+def category_changed(sender, instance, **kwargs):
+    versions.bump('categories')
+
+
+@receiver((post_save, post_delete), sender=Genre)
+def genre_changed(sender, instance, **kwargs):
+    versions.bump('genres')
+
+
+@receiver((post_save, post_delete), sender=Title)
+def title_changed(sender, instance, **kwargs):
+    versions.bump('titles', f'title:{instance.pk}')
+
+
+@receiver((post_save, post_delete), sender=TitleGenres)
+@receiver((post_save, post_delete), sender=Review)
+def title_part_changed(sender, instance, **kwargs):
+    """Жанры и отзывы входят в представление произведения."""
+    versions.bump('titles', f'title:{instance.title_id}')
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    """Имя автора входит в представление отзывов. У нового пользователя
+    отзывов еще нет, удаление пользователя удаляет и его отзывы."""
+    if not created:
+        versions.bump('users')
+
+
+BULK_LOAD_RECEIVERS = (
+    (post_save, review_saved, Review),
+    (post_delete, review_deleted, Review),
+    *(
+        (signal, handler, sender)
+        for signal in (post_save, post_delete)
+        for handler, sender in (
+            (category_changed, Category),
+            (genre_changed, Genre),
+            (title_changed, Title),
+            (title_part_changed, TitleGenres),
+            (title_part_changed, Review),
+        )
+    ),
+)
+
+
+@contextmanager
+def bulk_load_signals_disabled():
+    """Отключает пересчет рейтинга и версий на время массовой загрузки,
+    чтобы удаление и запись таблиц не обрабатывались построчно.
+    После такой загрузки рейтинг должен быть выставлен отдельно,
+    а версии каталога обновлены через versions.bump_catalogue()."""
+    for signal, handler, sender in BULK_LOAD_RECEIVERS:
+        signal.disconnect(handler, sender=sender)
+    try:
+        yield
+    finally:
+        for signal, handler, sender in BULK_LOAD_RECEIVERS:
+            signal.connect(handler, sender=sender)
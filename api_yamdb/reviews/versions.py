@@ -0,0 +1,47 @@
+from hashlib import blake2b
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{name}'
+CATALOGUE = 'catalogue'
+
+
+def bump(*names):
+    """Обновляет версии перечисленных ресурсов и коллекций."""
+    now = time()
+    cache.set_many(
+        {VERSION_KEY.format(name=name): now for name in names},
+        timeout=settings.VERSION_TIMEOUT,
+    )
+
+
+def bump_catalogue():
+    """Обновляет версии сразу всех ресурсов, например после массовой
+    загрузки, которая не вызывает сигналов моделей."""
+    bump(CATALOGUE)
+
+
+def get_versions(names):
+    """Возвращает версии ресурсов одним обращением к кешу.
+    Общая версия каталога добавляется всегда. Отсутствующие в кеше
+    версии создаются заново, что только заставит клиентов один раз
+    перезапросить данные. Поэтому срок жизни версии VERSION_TIMEOUT
+    ограничивает, как долго процесс, не видящий обновления версии
+    в другом процессе, отдает устаревшие данные."""
+    keys = [VERSION_KEY.format(name=name) for name in (CATALOGUE, *names)]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time()
+        new_versions = dict.fromkeys(missing, now)
+        cache.set_many(new_versions, timeout=settings.VERSION_TIMEOUT)
+        versions.update(new_versions)
+    return [versions[key] for key in keys]
+
+
+def get_etag(versions):
+    """ETag по набору версий."""
+    digest = blake2b(repr(versions).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
@@ -0,0 +1,87 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Review, Title
+from tests.utils import create_reviews
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleRating:
+
+    def test_01_rating_follows_reviews(self, admin_client, admin, user_client,
+                                       user, moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.score_sum, title.review_count) == (15, 3), (
+            'Проверьте, что при создании отзыва в произведении '
+            'обновляются сумма оценок и количество отзывов.'
+        )
+
+        user_client.patch(
+            f'{url}reviews/{reviews[1]["id"]}/', data={'score': 1}
+        )
+        assert admin_client.get(url).json().get('rating') == 3, (
+            'Проверьте, что при изменении оценки отзыва пересчитывается '
+            'рейтинг произведения.'
+        )
+
+        moderator_client.delete(f'{url}reviews/{reviews[2]["id"]}/')
+        user.delete()
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count) == (5, 1), (
+            'Проверьте, что при удалении отзыва, в том числе каскадном, '
+            'пересчитывается рейтинг произведения.'
+        )
+
+        admin_client.delete(f'/api/v1/users/{admin.username}/')
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count) == (0, 0), (
+            'Проверьте, что при удалении пользователя через API '
+            'пересчитывается рейтинг его произведений.'
+        )
+
+    def test_02_rebuild_rating(self, admin_client, admin):
+        reviews, titles = create_reviews(admin_client, {admin: admin_client})
+        Title.objects.filter(pk=titles[0]['id']).update(
+            score_sum=0, review_count=0
+        )
+        Review.objects.filter(pk=reviews[0]['id']).update(score=7)
+
+        out = StringIO()
+        call_command('rebuildrating', '--check', stdout=out)
+        assert 'с расхождениями: 1' in out.getvalue()
+        assert Title.objects.get(pk=titles[0]['id']).review_count == 0
+
+        call_command('rebuildrating', stdout=StringIO())
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.score_sum, title.review_count) == (7, 1), (
+            'Проверьте, что команда `rebuildrating` пересчитывает рейтинг '
+            'произведений.'
+        )
+
+    def test_03_title_save_keeps_counters(self, admin_client, user):
+        title = Title.objects.create(name='Фильм', year=2000)
+        stale = Title.objects.get(pk=title.id)
+        Review.objects.create(title=title, author=user, text='.', score=9)
+        stale.name = 'Новое название'
+        stale.save()
+        response = admin_client.patch(
+            f'/api/v1/titles/{title.id}/', data={'year': 2001},
+            format='json'
+        )
+        assert response.status_code == 200
+        title.refresh_from_db()
+        assert (title.name, title.score_sum, title.review_count) == (
+            'Новое название', 9, 1
+        ), (
+            'Проверьте, что сохранение произведения не перезаписывает '
+            'сумму оценок и количество отзывов.'
+        )
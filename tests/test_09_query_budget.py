@@ -0,0 +1,436 @@
+from itertools import count as counter
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import user_cache
+from api.serializers import CANNOT_ADD_MORE_THAN_ONE_COMMENT
+from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.signals import recalculate_title_rating
+
+SIZES = (1, 50)
+sequence = counter()
+
+
+def create_catalogue(count):
+    category = Category.objects.create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.create(name=f'Жанр {idx}', slug=f'genre-{idx}')
+        for idx in range(3)
+    ]
+    titles = []
+    for idx in range(count):
+        title = Title.objects.create(
+            name=f'Произведение {idx}', year=2000, category=category
+        )
+        title.genre.set(genres)
+        titles.append(title)
+    return titles
+
+
+def create_users(count):
+    prefix = f'budget{next(sequence)}x'
+    User.objects.bulk_create(
+        User(username=f'{prefix}{idx}', email=f'{prefix}{idx}@yamdb.fake')
+        for idx in range(count)
+    )
+    return list(User.objects.filter(username__startswith=prefix))
+
+
+def create_title(genres=3):
+    idx = next(sequence)
+    category = Category.objects.create(name=f'Кат {idx}', slug=f'cat-{idx}')
+    title = Title.objects.create(
+        name=f'Произведение {idx}', year=2000, category=category
+    )
+    title.genre.set(
+        Genre.objects.create(name=f'Жанр {idx}-{num}', slug=f'g-{idx}-{num}')
+        for num in range(genres)
+    )
+    return title
+
+
+def create_reviews(title, count):
+    Review.objects.bulk_create(
+        Review(title=title, author=author, text='Отзыв', score=5)
+        for author in create_users(count)
+    )
+    recalculate_title_rating(title.id)
+    return list(title.reviews.all())
+
+
+def create_review(comments):
+    review = create_reviews(create_title(), 1)[0]
+    Comment.objects.bulk_create(
+        Comment(review=review, author=author, text='Комментарий')
+        for author in create_users(comments)
+    )
+    return review
+
+
+def reviews_url(title_id):
+    return f'/api/v1/titles/{title_id}/reviews/'
+
+
+def review_url(review):
+    return f'{reviews_url(review.title_id)}{review.id}/'
+
+
+def comment_url(count):
+    review = create_review(count)
+    return f'{review_url(review)}comments/{review.comments.first().id}/'
+
+
+def create_author(count):
+    """Пользователь с отзывами на count произведений и комментариями."""
+    user = create_users(1)[0]
+    for _ in range(count):
+        review = Review.objects.create(
+            title=create_title(genres=0), author=user, text='...', score=7
+        )
+        Comment.objects.create(review=review, author=user, text='...')
+    return user
+
+
+# Каждая функция создает count связанных объектов и возвращает метод,
+# адрес, данные запроса и ожидаемый статус ответа. Если в данных запроса
+# есть список (жанры произведения), в нем count элементов. Для создания
+# объектов без связей count - количество уже существующих объектов
+# той же таблицы.
+
+def title_list(count):
+    for _ in range(count):
+        create_title()
+    return 'get', '/api/v1/titles/', None, 200
+
+
+def title_detail(count):
+    title = create_title(count)
+    create_reviews(title, count)
+    return 'get', f'/api/v1/titles/{title.id}/', None, 200
+
+
+def title_create(count):
+    title = create_title(count)
+    return 'post', '/api/v1/titles/', {
+        'name': 'Новое',
+        'year': 2000,
+        'category': title.category.slug,
+        'genre': list(title.genre.values_list('slug', flat=True)),
+    }, 201
+
+
+def title_update(count):
+    title = create_title(count)
+    create_reviews(title, count)
+    genres = create_title(count).genre.values_list('slug', flat=True)
+    return 'patch', f'/api/v1/titles/{title.id}/', {
+        'name': 'Новое', 'genre': list(genres)
+    }, 200
+
+
+def title_batch(count):
+    title = create_title()
+    slugs = list(title.genre.values_list('slug', flat=True))
+    name = f'Пакет {next(sequence)}'
+    Title.objects.bulk_create(
+        Title(name=name, year=2000) for _ in range(count)
+    )
+    updated = Title.objects.filter(name=name)
+    return 'post', '/api/v1/titles/batch/', [
+        *(
+            {
+                'name': 'Новое', 'year': 2000,
+                'category': title.category.slug, 'genre': slugs,
+            }
+            for _ in range(count)
+        ),
+        *({'id': obj.id, 'name': 'Новое', 'genre': slugs} for obj in updated),
+    ], 201
+
+
+def title_delete(count):
+    title = create_title(count)
+    for review in create_reviews(title, count):
+        Comment.objects.create(review=review, author=review.author, text='.')
+    return 'delete', f'/api/v1/titles/{title.id}/', None, 204
+
+
+def category_list(count):
+    for _ in range(count):
+        create_title(genres=0)
+    return 'get', '/api/v1/categories/', None, 200
+
+
+def category_delete(count):
+    title = create_title(genres=0)
+    Title.objects.bulk_create(
+        Title(name='...', year=2000, category=title.category)
+        for _ in range(count)
+    )
+    return 'delete', f'/api/v1/categories/{title.category.slug}/', None, 204
+
+
+def genre_list(count):
+    create_title(count)
+    return 'get', '/api/v1/genres/', None, 200
+
+
+def genre_delete(count):
+    genre = create_title(1).genre.get()
+    for _ in range(count):
+        create_title(genres=0).genre.add(genre)
+    return 'delete', f'/api/v1/genres/{genre.slug}/', None, 204
+
+
+def named_create(model, url):
+    def create(count):
+        idx = next(sequence)
+        model.objects.bulk_create(
+            model(name=f'{idx}-{num}', slug=f'old-{idx}-{num}')
+            for num in range(count)
+        )
+        return 'post', url, {'name': 'Новое', 'slug': f'new-{idx}'}, 201
+    return create
+
+
+def review_list(count):
+    title = create_title()
+    create_reviews(title, count)
+    return 'get', reviews_url(title.id), None, 200
+
+
+def review_create(count):
+    title = create_title()
+    create_reviews(title, count)
+    return 'post', reviews_url(title.id), {'text': '.', 'score': 8}, 201
+
+
+def review_action(method, data, status):
+    def action(count):
+        return method, review_url(create_review(count)), data, status
+    return action
+
+
+def comment_list(count):
+    review = create_review(count)
+    return 'get', f'{review_url(review)}comments/', None, 200
+
+
+def comment_create(count):
+    review = create_review(count)
+    return 'post', f'{review_url(review)}comments/', {'text': '.'}, 201
+
+
+def comment_action(method, data, status):
+    def action(count):
+        return method, comment_url(count), data, status
+    return action
+
+
+def user_list(count):
+    create_users(count)
+    return 'get', '/api/v1/users/', None, 200
+
+
+def user_create(count):
+    create_users(count)
+    idx = next(sequence)
+    return 'post', '/api/v1/users/', {
+        'username': f'new{idx}', 'email': f'new{idx}@yamdb.fake'
+    }, 201
+
+
+def user_action(method, data, status):
+    def action(count):
+        user = create_author(count)
+        return method, f'/api/v1/users/{user.username}/', data, status
+    return action
+
+
+def user_me(count):
+    create_users(count)
+    return 'get', '/api/v1/users/me/', None, 200
+
+
+def signup(count):
+    create_users(count)
+    idx = next(sequence)
+    return 'post', '/api/v1/auth/signup/', {
+        'username': f'signup{idx}', 'email': f'signup{idx}@yamdb.fake'
+    }, 200
+
+
+def get_token(count):
+    user = create_users(count)[0]
+    return 'post', '/api/v1/auth/token/', {
+        'username': user.username,
+        'confirmation_code': default_token_generator.make_token(user),
+    }, 200
+
+
+ROUTES = {
+    'title-list': title_list,
+    'title-detail': title_detail,
+    'title-create': title_create,
+    'title-update': title_update,
+    'title-batch': title_batch,
+    'title-delete': title_delete,
+    'category-list': category_list,
+    'category-create': named_create(Category, '/api/v1/categories/'),
+    'category-delete': category_delete,
+    'genre-list': genre_list,
+    'genre-create': named_create(Genre, '/api/v1/genres/'),
+    'genre-delete': genre_delete,
+    'review-list': review_list,
+    'review-detail': review_action('get', None, 200),
+    'review-create': review_create,
+    'review-update': review_action('patch', {'score': 3}, 200),
+    'review-delete': review_action('delete', None, 204),
+    'comment-list': comment_list,
+    'comment-detail': comment_action('get', None, 200),
+    'comment-create': comment_create,
+    'comment-update': comment_action('patch', {'text': 'Новый'}, 200),
+    'comment-delete': comment_action('delete', None, 204),
+    'user-list': user_list,
+    'user-detail': user_action('get', None, 200),
+    'user-create': user_create,
+    'user-update': user_action('patch', {'bio': 'Новая биография'}, 200),
+    'user-delete': user_action('delete', None, 204),
+    'user-me': user_me,
+    'signup': signup,
+    'get_token': get_token,
+}
+
+
+def count_queries(client, method, url, data):
+    """Количество запросов к базе при пустых кешах."""
+    cache.clear()
+    user_cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data, format='json')
+    return response, len(context)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09QueryBudget:
+
+    @pytest.mark.parametrize('count', (1, 5))
+    def test_01_title_list(self, client, django_assert_num_queries, count):
+        create_catalogue(count)
+        # COUNT для пагинации, выборка страницы и жанры одним запросом.
+        with django_assert_num_queries(3):
+            response = client.get('/api/v1/titles/')
+        assert len(response.json()['results']) == count
+
+    @pytest.mark.parametrize('count', (1, 5))
+    def test_02_title_detail(self, client, django_assert_num_queries, count):
+        titles = create_catalogue(count)
+        with django_assert_num_queries(2):
+            response = client.get(f'/api/v1/titles/{titles[0].id}/')
+        assert len(response.json()['genre']) == 3
+
+    def test_03_signup(self, client, django_assert_max_num_queries):
+        data = {'email': 'budget@yamdb.fake', 'username': 'budget'}
+        # Поиск по имени или почте, создание пользователя и письма.
+        with django_assert_max_num_queries(3):
+            response = client.post('/api/v1/auth/signup/', data=data)
+        assert response.status_code == 200
+        # Повторный запрос: поиск и письмо.
+        with django_assert_max_num_queries(2):
+            response = client.post('/api/v1/auth/signup/', data=data)
+        assert response.status_code == 200
+        with django_assert_max_num_queries(1):
+            response = client.post(
+                '/api/v1/auth/signup/',
+                data={'email': 'other@yamdb.fake', 'username': 'budget'}
+            )
+        assert response.status_code == 400
+
+    def test_04_nested_routes(self, user_client, user,
+                              django_assert_num_queries):
+        review = create_review(1)
+        url = f'{review_url(review)}comments/'
+        user_client.get(url)
+        # Отзыв вместе с проверкой произведения и вставка комментария.
+        with django_assert_num_queries(2):
+            response = user_client.post(url, data={'text': '.'})
+        assert response.status_code == 201
+
+        other = create_title()
+        wrong_url = f'{review_url(review)}comments/'.replace(
+            f'titles/{review.title_id}/', f'titles/{other.id}/'
+        )
+        for response in (
+            user_client.get(wrong_url),
+            user_client.post(wrong_url, data={'text': '.'}),
+            user_client.get(reviews_url(0)),
+        ):
+            assert response.status_code == 404, (
+                'Проверьте, что для отзыва другого произведения или '
+                'несуществующего произведения возвращается статус 404.'
+            )
+
+    def test_05_review_create(self, user_client, user,
+                              django_assert_num_queries):
+        title = create_title()
+        url = reviews_url(title.id)
+        user_client.get(url)
+        # Произведение, BEGIN, вставка отзыва и изменение рейтинга.
+        with django_assert_num_queries(4):
+            response = user_client.post(url, data={'text': '.', 'score': 5})
+        assert response.status_code == 201
+        response = user_client.post(url, data={'text': '.', 'score': 5})
+        assert response.status_code == 400, (
+            'Проверьте, что повторный отзыв автора на произведение '
+            'отклоняется ограничением unique_review со статусом 400.'
+        )
+        assert response.json() == {
+            'non_field_errors': [CANNOT_ADD_MORE_THAN_ONE_COMMENT]
+        }
+        title.refresh_from_db()
+        assert (title.score_sum, title.review_count) == (5, 1)
+
+    def test_06_title_slugs(self, admin_client):
+        title = create_title(10)
+        slugs = list(title.genre.values_list('slug', flat=True))
+        counts = []
+        for genres in (slugs[:1], slugs + slugs[:1]):
+            response, queries = count_queries(
+                admin_client, 'post', '/api/v1/titles/', {
+                    'name': 'Новое', 'year': 2000,
+                    'category': title.category.slug, 'genre': genres,
+                }
+            )
+            assert response.status_code == 201
+            created = Title.objects.get(pk=response.json()['id'])
+            assert created.genre.count() == len(set(genres))
+            counts.append(queries)
+        assert counts[0] == counts[1], (
+            'Проверьте, что слаги жанров загружаются одним запросом, '
+            f'а связи с жанрами записываются одной вставкой: {counts}.'
+        )
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Новое', 'year': 2000,
+            'category': title.category.slug, 'genre': [slugs[0], 'missing'],
+        }, format='json')
+        assert response.status_code == 400
+        assert 'genre' in response.json()
+
+    @pytest.mark.parametrize('route', ROUTES)
+    def test_07_route_does_not_grow(self, admin_client, route):
+        counts = []
+        for size in SIZES:
+            method, url, data, status = ROUTES[route](size)
+            response, queries = count_queries(admin_client, method, url, data)
+            assert response.status_code == status, (
+                f'Проверьте, что запрос `{route}` возвращает статус {status}.'
+            )
+            counts.append(queries)
+        assert counts[0] == counts[-1], (
+            f'Проверьте, что количество запросов к базе для `{route}` не '
+            f'зависит от количества связанных объектов: {counts}.'
+        )
@@ -0,0 +1,82 @@
+from http import HTTPStatus
+
+import json
+from base64 import urlsafe_b64encode
+
+import pytest
+
+from reviews.models import Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10CursorPagination:
+
+    def test_01_title_cursor(self, client, django_assert_num_queries):
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {idx % 3}', year=2000)
+            for idx in range(12)
+        )
+        expected = list(
+            Title.objects.order_by('name', 'id').values_list('id', flat=True)
+        )
+        url = '/api/v1/titles/?cursor='
+        received = []
+        while url:
+            with django_assert_num_queries(2):
+                response = client.get(url)
+            assert response.status_code == HTTPStatus.OK
+            data = response.json()
+            assert 'count' not in data, (
+                'Проверьте, что при пагинации по курсору не выполняется '
+                'подсчет количества объектов.'
+            )
+            received.extend(title['id'] for title in data['results'])
+            url = data['next']
+        assert received == expected, (
+            'Проверьте, что пагинация по курсору проходит все произведения '
+            'в порядке (название, id) без пропусков и повторов.'
+        )
+
+        response = client.get('/api/v1/titles/?cursor=')
+        response = client.get(response.json()['next'])
+        response = client.get(response.json()['previous'])
+        assert [title['id'] for title in response.json()['results']] == (
+            expected[:5]
+        )
+
+    def test_02_invalid_cursor(self, client):
+        response = client.get('/api/v1/titles/?cursor=broken')
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    @pytest.mark.parametrize('position', (
+        ['x', 'y'], [{'a': 1}, 1], [None, 1], ['a', [1]],
+    ))
+    def test_03_tampered_cursor(self, client, position):
+        cursor = urlsafe_b64encode(
+            json.dumps([False, position]).encode()
+        ).decode()
+        for url in (
+            '/api/v1/titles/', '/api/v1/titles/1/reviews/',
+            '/api/v1/titles/1/reviews/1/comments/',
+        ):
+            response = client.get(f'{url}?cursor={cursor}')
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                'Проверьте, что курсор со значениями неверных типов '
+                'дает ответ 404.'
+            )
+
+    @pytest.mark.parametrize('param', ('ordering=year', 'search=игра'))
+    def test_04_cursor_with_ordering(self, client, param):
+        response = client.get(f'/api/v1/titles/?cursor=&{param}')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что сортировку и поиск нельзя передать вместе '
+            'с cursor.'
+        )
+
+    def test_05_page_number_unchanged(self, client):
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {idx}', year=2000) for idx in range(7)
+        )
+        data = client.get('/api/v1/titles/?page=2').json()
+        assert data['count'] == 7
+        assert len(data['results']) == 2
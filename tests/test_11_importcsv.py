@@ -0,0 +1,238 @@
+import csv
+import gzip
+import os
+import shutil
+import zipfile
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import (Comment, Genre, Review, Title, TitleGenres,
+                            User)
+from tests.conftest import MANAGE_PATH
+
+
+@pytest.fixture
+def import_dir(monkeypatch, tmp_path):
+    shutil.copytree(
+        os.path.join(MANAGE_PATH, 'static', 'data'),
+        tmp_path / 'static' / 'data'
+    )
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / 'static' / 'data'
+
+
+def rewrite_csv(path, change):
+    with open(path, encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        fieldnames = reader.fieldnames
+        rows = [row for row in map(change, reader) if row is not None]
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11ImportCsv:
+
+    def test_01_import(self, import_dir):
+        out = StringIO()
+        call_command('importcsv', '--batch-size', '10', stdout=out)
+        assert Title.objects.count() == 32
+        assert TitleGenres.objects.count() == 42
+        assert User.objects.count() == 5
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert 'строк/с' in out.getvalue()
+
+        out = StringIO()
+        call_command('rebuildrating', '--check', stdout=out)
+        assert 'с расхождениями: 0' in out.getvalue(), (
+            'Проверьте, что после импорта у произведений выставлен рейтинг.'
+        )
+
+    def test_02_reimport(self, import_dir):
+        call_command('importcsv', stdout=StringIO())
+        call_command('importcsv', stdout=StringIO())
+        assert Review.objects.count() == 72
+
+    def test_03_upsert(self, import_dir):
+        call_command('importcsv', stdout=StringIO())
+        comment_ids = set(Comment.objects.values_list('id', flat=True))
+
+        def change_review(row):
+            if row['id'] == '1':
+                row['score'] = '1'
+            if row['id'] == '2':
+                return None
+            return row
+
+        rewrite_csv(import_dir / 'review.csv', change_review)
+        out = StringIO()
+        call_command(
+            'importcsv', '--upsert', '--delete-missing', stdout=out
+        )
+        assert (
+            'Таблица Отзывы: добавлено 0, обновлено 1, без изменений 70, '
+            'удалено 1'
+        ) in out.getvalue()
+        assert Review.objects.get(pk=1).score == 1
+        assert not Review.objects.filter(pk=2).exists()
+        assert set(
+            Comment.objects.values_list('id', flat=True)
+        ) == comment_ids, (
+            'Проверьте, что в режиме --upsert не удаляются связанные объекты.'
+        )
+
+        out = StringIO()
+        call_command('rebuildrating', '--check', stdout=out)
+        assert 'с расхождениями: 0' in out.getvalue()
+
+    def test_04_delete_missing_keeps_rejected(self, import_dir):
+        call_command('importcsv', stdout=StringIO())
+        comments = Comment.objects.filter(review_id=6).count()
+
+        def break_review(row):
+            if row['id'] == '6':
+                row['score'] = '11'
+            return row
+
+        rewrite_csv(import_dir / 'review.csv', break_review)
+        call_command(
+            'importcsv', '--upsert', '--delete-missing', '--tables', 'review',
+            stdout=StringIO()
+        )
+        assert Review.objects.filter(pk=6).exists(), (
+            'Проверьте, что отклоненная строка файла не считается '
+            'удаленной в режиме --delete-missing.'
+        )
+        assert Comment.objects.filter(review_id=6).count() == comments
+
+        def break_id(row):
+            if row['id'] == '7':
+                row['id'] = 'seven'
+            return row
+
+        rewrite_csv(import_dir / 'review.csv', break_id)
+        out = StringIO()
+        call_command(
+            'importcsv', '--upsert', '--delete-missing', '--tables', 'review',
+            stdout=out
+        )
+        assert Review.objects.filter(pk=7).exists()
+        assert 'удаление отсутствующих строк пропущено' in out.getvalue()
+
+    def test_05_upsert_pub_date(self, import_dir):
+        call_command('importcsv', stdout=StringIO())
+        assert Review.objects.get(pk=1).pub_date.isoformat().startswith(
+            '2019-09-24T21:08:21'
+        ), 'Проверьте, что сохраняется дата публикации из файла.'
+
+        def change_date(row):
+            if row['id'] == '1':
+                row['pub_date'] = '2021-01-01T00:00:00Z'
+            return row
+
+        rewrite_csv(import_dir / 'review.csv', change_date)
+        out = StringIO()
+        call_command(
+            'importcsv', '--upsert', '--tables', 'review', stdout=out
+        )
+        assert 'обновлено 1, без изменений 71' in out.getvalue()
+        assert Review.objects.get(pk=1).pub_date.year == 2021
+
+    def test_06_rejects_with_workers(self, import_dir):
+        def break_user(row):
+            if row['id'] == '100':
+                row['username'] = 'bad name'
+            return row
+
+        def break_review(row):
+            if row['id'] == '1':
+                row['score'] = '11'
+            return row
+
+        rewrite_csv(import_dir / 'users.csv', break_user)
+        rewrite_csv(import_dir / 'review.csv', break_review)
+        rejects = import_dir / 'rejects.csv'
+        out = StringIO()
+        call_command(
+            'importcsv', '--workers', '2', '--batch-size', '10',
+            '--rejects', str(rejects), stdout=out
+        )
+        assert User.objects.count() == 4
+        assert not Review.objects.filter(pk=1).exists()
+        with open(rejects, encoding='utf-8', newline='') as file:
+            rejected = list(csv.DictReader(file))
+        assert {(row['table'], row['line']) for row in rejected} >= {
+            ('User', '2'), ('Review', '2')
+        }, (
+            'Проверьте, что отклоненные строки записываются в файл '
+            'с номерами строк.'
+        )
+        assert all(row['error'] for row in rejected)
+
+    def test_07_bad_rows_do_not_abort(self, import_dir):
+        with open(import_dir / 'users.csv', 'a', encoding='utf-8') as file:
+            file.write('\n200,short\n')
+            file.write('201,bingobongo,other@yamdb.fake,user,,,\n')
+            file.write('202,other,bingobongo@yamdb.fake,user,,,\n')
+        with open(import_dir / 'review.csv', 'a', encoding='utf-8') as file:
+            file.write('\n900,1,Повтор,100,5,2020-01-01T00:00:00Z\n')
+            file.write('1,2,Повтор id,101,5,2020-01-01T00:00:00Z\n')
+            file.write('901,2,Дата,101,5,вчера\n')
+            file.write('902,3\n')
+        rejects = import_dir / 'rejects.csv'
+        # Маленькие порции: повторы попадают в разные порции.
+        call_command(
+            'importcsv', '--rejects', str(rejects), '--batch-size', '3',
+            stdout=StringIO()
+        )
+        assert User.objects.count() == 5
+        assert Review.objects.count() == 72, (
+            'Проверьте, что строки с повтором уникальных значений, '
+            'неполные строки и некорректные даты отклоняются, '
+            'а загрузка продолжается.'
+        )
+        with open(rejects, encoding='utf-8', newline='') as file:
+            rejected = list(csv.DictReader(file))
+        assert len(rejected) == 7
+
+        with open(import_dir / 'users.csv', 'w', encoding='utf-8') as file:
+            file.write('id,username,email,role,bio,first_name,last_name\n')
+            file.write('101,bingobongo,capt@yamdb.fake,user,,,\n')
+        out = StringIO()
+        call_command(
+            'importcsv', '--upsert', '--tables', 'user',
+            '--rejects', str(rejects), stdout=out
+        )
+        assert 'отклонено строк: 1' in out.getvalue(), (
+            'Проверьте, что в режиме --upsert строка, занимающая '
+            'уникальное значение другого объекта в базе, отклоняется.'
+        )
+        assert User.objects.get(pk=101).username == 'capt_obvious'
+
+    def test_08_compressed_sources(self, import_dir, tmp_path):
+        archive = tmp_path / 'data.zip'
+        with zipfile.ZipFile(archive, 'w') as bundle:
+            for path in import_dir.iterdir():
+                bundle.write(path, f'dump/{path.name}')
+        call_command('importcsv', str(archive), stdout=StringIO())
+        assert Review.objects.count() == 72
+
+        for path in list(import_dir.iterdir()):
+            with open(path, 'rb') as src, gzip.open(f'{path}.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            path.unlink()
+        Genre.objects.all().delete()
+        call_command(
+            'importcsv', str(import_dir), '--upsert', '--tables', 'genre',
+            stdout=StringIO()
+        )
+        assert Genre.objects.count() == 15
+        assert Review.objects.count() == 72, (
+            'Проверьте, что с параметром --tables загружаются только '
+            'указанные таблицы.'
+        )
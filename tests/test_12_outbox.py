@@ -0,0 +1,149 @@
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.utils.timezone import now
+
+from reviews.models import OutgoingEmail
+
+
+class BrokenBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('SMTP недоступен')
+
+
+class RefusedBackend(EmailBackend):
+
+    def open(self):
+        raise ConnectionRefusedError('SMTP не отвечает')
+
+
+class LeaseCheckingBackend(EmailBackend):
+    checks = []
+
+    def send_messages(self, messages):
+        LeaseCheckingBackend.checks.append((
+            connection.in_atomic_block,
+            OutgoingEmail.objects.filter(
+                recipient__in=[message.to[0] for message in messages],
+                send_after__gt=now(),
+            ).exists(),
+        ))
+        return super().send_messages(messages)
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12Outbox:
+
+    def test_01_signup_enqueues_email(self, client):
+        outbox_before_count = len(mail.outbox)
+        data = {'email': 'queued@yamdb.fake', 'username': 'queued'}
+        response = client.post('/api/v1/auth/signup/', data=data)
+        assert response.json() == data
+        assert len(mail.outbox) == outbox_before_count, (
+            'Проверьте, что при регистрации письмо не отправляется '
+            'в ходе обработки запроса, а ставится в очередь.'
+        )
+        assert OutgoingEmail.objects.filter(
+            recipient=data['email'], sent_at__isnull=True
+        ).exists()
+
+        out = StringIO()
+        call_command('sendemails', stdout=out)
+        assert mail.outbox[-1].to == [data['email']]
+        assert 'Отправлено писем: 1' in out.getvalue()
+        assert 'в очереди: 0' in out.getvalue()
+
+    def test_02_retry_with_backoff(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_12_outbox.BrokenBackend'
+        email = OutgoingEmail.objects.create(
+            recipient='retry@yamdb.fake', from_email='from@yamdb.fake',
+            subject='Тема', body='Текст'
+        )
+        call_command('sendemails', '--backoff', '60', stdout=StringIO())
+        email.refresh_from_db()
+        assert email.attempts == 1
+        assert email.sent_at is None
+        assert 'SMTP недоступен' in email.last_error
+        assert email.send_after > now(), (
+            'Проверьте, что повторная попытка отправки откладывается.'
+        )
+
+        settings.EMAIL_BACKEND = (
+            'django.core.mail.backends.locmem.EmailBackend'
+        )
+        call_command('sendemails', stdout=StringIO())
+        email.refresh_from_db()
+        assert email.sent_at is None
+
+        OutgoingEmail.objects.update(send_after=now())
+        call_command('sendemails', stdout=StringIO())
+        email.refresh_from_db()
+        assert email.sent_at is not None
+        assert email.attempts == 2
+
+    def test_03_no_connection_for_empty_queue(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_12_outbox.CountingBackend'
+        CountingBackend.opened = 0
+        call_command('sendemails', stdout=StringIO())
+        assert CountingBackend.opened == 0, (
+            'Проверьте, что соединение с почтовым сервером не открывается, '
+            'если в очереди нет писем.'
+        )
+
+        OutgoingEmail.objects.bulk_create(
+            OutgoingEmail(
+                recipient=f'user{idx}@yamdb.fake', from_email='from@yamdb.fake',
+                subject='Тема', body='Текст'
+            )
+            for idx in range(3)
+        )
+        call_command('sendemails', '--batch-size', '2', stdout=StringIO())
+        assert CountingBackend.opened == 1
+        assert not OutgoingEmail.objects.filter(sent_at__isnull=True).exists()
+
+    def test_04_refused_connection(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_12_outbox.RefusedBackend'
+        email = OutgoingEmail.objects.create(
+            recipient='refused@yamdb.fake', from_email='from@yamdb.fake',
+            subject='Тема', body='Текст'
+        )
+        err = StringIO()
+        call_command(
+            'sendemails', '--backoff', '60', stdout=StringIO(), stderr=err
+        )
+        email.refresh_from_db()
+        assert email.attempts == 1, (
+            'Проверьте, что при недоступном почтовом сервере письмам '
+            'засчитывается неудачная попытка, а команда не падает.'
+        )
+        assert 'SMTP не отвечает' in email.last_error
+        assert email.send_after > now()
+        assert 'Почтовый сервер недоступен' in err.getvalue()
+
+    def test_05_send_outside_transaction(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_12_outbox.LeaseCheckingBackend'
+        LeaseCheckingBackend.checks = []
+        email = OutgoingEmail.objects.create(
+            recipient='lease@yamdb.fake', from_email='from@yamdb.fake',
+            subject='Тема', body='Текст'
+        )
+        call_command('sendemails', '--lease', '300', stdout=StringIO())
+        assert LeaseCheckingBackend.checks == [(False, True)], (
+            'Проверьте, что письма отправляются вне транзакции, а порция '
+            'на время отправки откладывается для других процессов.'
+        )
+        email.refresh_from_db()
+        assert email.sent_at is not None
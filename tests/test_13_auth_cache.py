@@ -0,0 +1,47 @@
+from http import HTTPStatus
+
+import pytest
+
+from api.authentication import bump_generation
+from reviews.models import User
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13AuthCache:
+
+    def test_01_cached_user(self, user_client, django_assert_num_queries):
+        url = '/api/v1/users/me/'
+        user_client.get(url)
+        with django_assert_num_queries(0):
+            response = user_client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что повторный запрос с тем же токеном '
+            'не обращается к базе за пользователем.'
+        )
+
+    def test_02_role_change_invalidates(self, admin_client, user_client,
+                                        user):
+        url = '/api/v1/users/'
+        assert user_client.get(url).status_code == HTTPStatus.FORBIDDEN
+        response = admin_client.patch(
+            f'{url}{user.username}/', data={'role': 'admin'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert user_client.get(url).status_code == HTTPStatus.OK, (
+            'Проверьте, что при изменении роли пользователя его запись '
+            'удаляется из кеша аутентификации.'
+        )
+
+        user.is_active = False
+        user.save()
+        assert user_client.get(url).status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_03_invalidates_other_processes(self, user_client, user):
+        url = '/api/v1/users/'
+        assert user_client.get(url).status_code == HTTPStatus.FORBIDDEN
+        User.objects.filter(id=user.id).update(role='admin')
+        bump_generation(str(user.id))
+        assert user_client.get(url).status_code == HTTPStatus.OK, (
+            'Проверьте, что изменение пользователя в другом процессе '
+            'сбрасывает его запись в кеше аутентификации через общий кеш.'
+        )
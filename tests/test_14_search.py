@@ -0,0 +1,77 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14FullTextSearch:
+
+    def test_01_title_search(self, client):
+        first = Title.objects.create(
+            name='Побег из Шоушенка', year=1994,
+            description='Тюрьма, надежда и побег'
+        )
+        second = Title.objects.create(
+            name='Зеленая миля', year=1999, description='Тюрьма и чудо'
+        )
+        Title.objects.create(name='Крестный отец', year=1972)
+
+        response = client.get('/api/v1/titles/?search=тюрьм')
+        assert response.status_code == HTTPStatus.OK
+        assert {title['id'] for title in response.json()['results']} == {
+            first.id, second.id
+        }, (
+            'Проверьте, что поиск по `/api/v1/titles/` находит произведения '
+            'по началу слова в названии и описании.'
+        )
+
+        response = client.get('/api/v1/titles/?search=побег')
+        results = response.json()['results']
+        assert [title['id'] for title in results] == [first.id]
+
+        second.name = 'Побег из тюрьмы'
+        second.save()
+        first.delete()
+        response = client.get('/api/v1/titles/?search=побег')
+        assert [title['id'] for title in response.json()['results']] == [
+            second.id
+        ], 'Проверьте, что поисковый индекс обновляется при изменениях.'
+
+    def test_02_category_and_user_search(self, admin_client, admin):
+        Category.objects.create(name='Фильмы', slug='films')
+        Category.objects.create(name='Книги', slug='books')
+        response = admin_client.get('/api/v1/categories/?search=фильм')
+        assert [c['slug'] for c in response.json()['results']] == ['films']
+
+        response = admin_client.get('/api/v1/users/?search=testad')
+        assert [u['username'] for u in response.json()['results']] == [
+            admin.username
+        ]
+
+        response = admin_client.get('/api/v1/categories/?search=%22)(*')
+        assert response.status_code == HTTPStatus.OK
+
+    def test_03_search_joins_index_once(self, client):
+        if connection.vendor != 'sqlite':
+            pytest.skip('Проверка планов запросов написана для SQLite')
+        Title.objects.create(name='Побег из Шоушенка', year=1994)
+        with CaptureQueriesContext(connection) as context:
+            client.get('/api/v1/titles/?search=побег')
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if 'reviews_title_fts' not in query['sql']:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+        assert plans, 'Не найден запрос поиска по индексу reviews_title_fts.'
+        for plan in plans:
+            assert 'VIRTUAL TABLE' in plan and 'SUBQUERY' not in plan, (
+                'Проверьте, что индекс полнотекстового поиска присоединяется '
+                'к таблице один раз, без подзапроса для каждой строки: '
+                f'{plan}'
+            )
@@ -0,0 +1,119 @@
+from http import HTTPStatus
+from time import sleep
+
+import pytest
+from django.core.cache import cache
+
+from api import metrics
+from api.mixins import get_response_cache_key
+from reviews.models import Category, Review, Title
+from reviews.versions import get_etag, get_versions
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15ConditionalGet:
+
+    def test_01_collection(self, client, django_assert_num_queries):
+        url = '/api/v1/categories/'
+        Category.objects.create(name='Фильм', slug='films')
+        response = client.get(url)
+        etag = response['ETag']
+        with django_assert_num_queries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f'Проверьте, что GET-запрос к `{url}` с актуальным ETag '
+            'возвращает ответ со статусом 304 без запросов к базе.'
+        )
+        response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        Category.objects.create(name='Книги', slug='books')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['count'] == 2
+
+    def test_02_title_detail(self, client, user):
+        title = Title.objects.create(name='Фильм', year=2000)
+        url = f'/api/v1/titles/{title.id}/'
+        etag = client.get(url)['ETag']
+        assert client.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        ).status_code == HTTPStatus.NOT_MODIFIED
+
+        Review.objects.create(title=title, author=user, text='...', score=8)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что новый отзыв меняет ETag произведения.'
+        )
+        assert response.json()['rating'] == 8
+
+    def test_03_anonymous_response_cache(self, client, user_client, user,
+                                         django_assert_num_queries):
+        title = Title.objects.create(name='Фильм', year=2000)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        Review.objects.create(title=title, author=user, text='...', score=8)
+        client.get(url, {'page': 1})
+        with django_assert_num_queries(0):
+            response = client.get(url, {'page': 1})
+        assert response.json()['count'] == 1, (
+            'Проверьте, что повторный анонимный GET-запрос к '
+            f'`{url}` отдается из кеша без запросов к базе.'
+        )
+        # Пользователь, COUNT и страница отзывов.
+        with django_assert_num_queries(3):
+            user_client.get(url, {'page': 1})
+
+        user.username = 'renamed'
+        user.save()
+        response = client.get(url, {'page': 1})
+        assert response.json()['results'][0]['author'] == 'renamed', (
+            'Проверьте, что кеш ответов сбрасывается при изменении '
+            'связанных моделей.'
+        )
+
+    def test_04_single_flight(self, client, django_assert_num_queries):
+        title = Title.objects.create(name='Фильм', year=2000)
+        url = f'/api/v1/titles/{title.id}/'
+        client.get(url)
+        title.name = 'Новое название'
+        title.save()
+        etag = get_etag(get_versions(
+            [f'title:{title.id}', 'categories', 'genres']
+        ))
+        key = get_response_cache_key(etag, f'http://testserver{url}', '')
+        cache.add(f'{key}:lock', 1)
+        event = (('event', 'single_flight_stampedes'),)
+        stampedes = metrics.events.values.get(event, 0)
+        with django_assert_num_queries(0):
+            response = client.get(url)
+        assert response.json()['name'] == 'Фильм', (
+            'Проверьте, что пока кеш пересобирает другой запрос, '
+            'отдается прежняя версия ответа без запросов к базе.'
+        )
+        assert 'ETag' not in response, (
+            'Проверьте, что прежняя версия ответа отдается без нового ETag.'
+        )
+        assert metrics.events.values[event] == stampedes + 1
+
+        cache.delete(f'{key}:lock')
+        assert client.get(url).json()['name'] == 'Новое название'
+
+    def test_05_version_timeout(self, client, settings):
+        settings.VERSION_TIMEOUT = 0.1
+        title = Title.objects.create(name='Фильм', year=2000)
+        url = f'/api/v1/titles/{title.id}/'
+        etag = client.get(url)['ETag']
+        # Запись в другом процессе: версии этого процесса не обновлены.
+        Title.objects.filter(pk=title.id).update(name='Новое название')
+        assert client.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        ).status_code == HTTPStatus.NOT_MODIFIED
+        sleep(0.2)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что версии ресурсов хранятся в кеше не дольше '
+            'VERSION_TIMEOUT.'
+        )
+        assert response.json()['name'] == 'Новое название'
@@ -0,0 +1,45 @@
+import logging
+
+import pytest
+
+from api import metrics
+from reviews.models import Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16RequestMetrics:
+
+    def test_01_view_stats(self, client, settings):
+        settings.SERVER_TIMING = True
+        Title.objects.create(name='Фильм', year=2000)
+        labels = (('view', 'TitleViewSet.list'),)
+        requests = metrics.view_requests.values.get(labels, 0)
+        response = client.get('/api/v1/titles/', {'page': 1})
+        assert metrics.view_requests.values[labels] == requests + 1, (
+            'Проверьте, что показатели запроса записываются по имени '
+            'представления и действия.'
+        )
+        assert metrics.VIEW_TOTALS['queries'].values[labels] > 0
+        assert metrics.VIEW_TOTALS['size'].values[labels] >= len(
+            response.content
+        )
+        assert 'db;dur=' in response['Server-Timing'], (
+            'Проверьте, что при SERVER_TIMING ответ содержит заголовок '
+            'Server-Timing.'
+        )
+
+        settings.SERVER_TIMING = False
+        response = client.get('/api/v1/titles/', {'page': 2})
+        assert 'Server-Timing' not in response
+
+    def test_02_budget_log(self, client, settings, caplog):
+        settings.REQUEST_QUERY_BUDGET = 0
+        with caplog.at_level(logging.WARNING, logger='api.performance'):
+            client.get('/api/v1/titles/', {'page': 3})
+        assert any(
+            'TitleViewSet.list' in record.getMessage()
+            for record in caplog.records
+        ), (
+            'Проверьте, что запросы сверх бюджета запросов к базе '
+            'записываются в лог api.performance.'
+        )
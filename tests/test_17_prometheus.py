@@ -0,0 +1,44 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17Prometheus:
+    url = '/api/v1/metrics/'
+
+    def test_01_permissions(self, client, user_client, moderator_client):
+        for api_client in (client, user_client, moderator_client):
+            assert api_client.get(self.url).status_code in (
+                HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN
+            ), (
+                f'Проверьте, что `{self.url}` доступен только '
+                'администратору.'
+            )
+
+    def test_02_exposition(self, client, admin_client):
+        title = Title.objects.create(name='Фильм', year=2000)
+        client.get(f'/api/v1/titles/{title.id}/')
+        client.get(f'/api/v1/titles/{title.id}/')
+        response = admin_client.get(self.url)
+        assert response.status_code == HTTPStatus.OK
+        assert response['Content-Type'].startswith('text/plain')
+        text = response.content.decode()
+        for line in (
+            '# TYPE yamdb_http_request_duration_seconds histogram',
+            'yamdb_http_request_duration_seconds_bucket{method="GET",'
+            'route="title-detail",le="+Inf"}',
+            'yamdb_http_responses_total{method="GET",route="title-detail",'
+            'status="200"}',
+            'yamdb_db_queries_per_request_count{method="GET",'
+            'route="title-detail"}',
+            'yamdb_http_requests_in_flight 1',
+            'yamdb_response_cache_requests_total{result="hit"}',
+            'yamdb_view_requests_total{view="TitleViewSet.retrieve"}',
+            'yamdb_view_db_queries_total{view="TitleViewSet.retrieve"}',
+        ):
+            assert line in text, (
+                f'Проверьте, что ответ `{self.url}` содержит `{line}`.'
+            )
@@ -0,0 +1,43 @@
+import pstats
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18Profiling:
+    url = '/api/v1/titles/'
+
+    def test_01_no_profile_without_admin(self, client, user_client,
+                                         settings, tmp_path):
+        settings.PROFILE_DIR = tmp_path
+        assert 'X-Profile' not in client.get(self.url)
+        assert 'X-Profile' not in user_client.get(
+            self.url, HTTP_X_PROFILE='1'
+        ), 'Проверьте, что профилирование доступно только администратору.'
+        assert not list(tmp_path.iterdir())
+
+    def test_02_profile(self, admin_client, settings, tmp_path):
+        settings.PROFILE_DIR = tmp_path
+        Title.objects.create(name='Фильм', year=2000)
+        response = admin_client.get(self.url, {'profile': 1})
+        assert response.status_code == HTTPStatus.OK
+        assert 'X-Profile' in response, (
+            'Проверьте, что ответ на запрос с параметром profile содержит '
+            'адрес сводки в заголовке X-Profile.'
+        )
+        summary = admin_client.get(response['X-Profile']).json()
+        assert summary['functions'], (
+            'Проверьте, что сводка содержит самые долгие функции.'
+        )
+        assert any(
+            'reviews_title' in query['sql'] for query in summary['queries']
+        ), 'Проверьте, что сводка содержит SQL-запросы.'
+
+        response = admin_client.get(summary['pstats'])
+        assert response.status_code == HTTPStatus.OK
+        path = tmp_path / 'downloaded.prof'
+        path.write_bytes(b''.join(response.streaming_content))
+        assert pstats.Stats(str(path)).total_calls > 0
@@ -0,0 +1,69 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Comment, Review, Title, TitleGenres, User
+
+SIZE = {
+    'users': 20, 'categories': 3, 'genres': 5, 'titles': 12,
+    'reviews_per_title': 3, 'comments_per_review': 1, 'batch_size': 5,
+}
+
+
+def dump():
+    return (
+        list(Title.objects.values_list(
+            'id', 'name', 'year', 'category', 'score_sum', 'review_count'
+        )),
+        list(TitleGenres.objects.values_list('title', 'genre')),
+        list(Review.objects.values_list('id', 'title', 'author', 'score')),
+        list(Comment.objects.values_list('id', 'review', 'author', 'text')),
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19Benchmark:
+
+    def test_01_generatedata(self):
+        call_command('generatedata', stdout=StringIO(), **SIZE)
+        assert User.objects.count() == SIZE['users']
+        assert Title.objects.count() == SIZE['titles']
+        first = dump()
+        call_command('generatedata', clear=True, stdout=StringIO(), **SIZE)
+        assert dump() == first, (
+            'Проверьте, что команда `generatedata` с одним и тем же seed '
+            'создает одинаковые данные.'
+        )
+        out = StringIO()
+        call_command('rebuildrating', check=True, stdout=out)
+        assert 'с расхождениями: 0' in out.getvalue(), (
+            'Проверьте, что `generatedata` заполняет сумму оценок и '
+            'количество отзывов произведений.'
+        )
+
+    def test_02_benchmark(self, tmp_path):
+        call_command('generatedata', stdout=StringIO(), **SIZE)
+        before = dump()
+        output = tmp_path / 'result.json'
+        call_command(
+            'benchmark', requests=60, warmup=5, write_ratio=0.3,
+            output=str(output), stdout=StringIO(),
+        )
+        result = json.loads(output.read_text())
+        assert result['total']['requests'] == 60
+        for stats in result['endpoints'].values():
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+                assert key in stats, (
+                    f'Проверьте, что результат `benchmark` содержит {key} '
+                    'для каждого вида запросов.'
+                )
+            assert not any(
+                status.startswith('5') for status in stats['statuses']
+            )
+        assert '201' in result['endpoints']['comment-create']['statuses']
+        assert dump() == before, (
+            'Проверьте, что `benchmark` без --keep-writes удаляет '
+            'созданные во время замера объекты и восстанавливает рейтинг.'
+        )
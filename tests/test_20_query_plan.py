@@ -0,0 +1,49 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, Review, Title
+
+
+def list_query_plans(client, url, table):
+    """Планы выполнения запросов выборки страницы из table."""
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    plans = []
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            sql = query['sql']
+            if f'FROM "{table}"' not in sql or 'ORDER BY' not in sql:
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+    return plans
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20QueryPlan:
+
+    @pytest.mark.parametrize('params', ('', '?cursor='))
+    def test_01_list_uses_index(self, user_client, user, params):
+        if connection.vendor != 'sqlite':
+            pytest.skip('Проверка планов запросов написана для SQLite')
+        title = Title.objects.create(name='Фильм', year=2000)
+        review = Review.objects.create(
+            title=title, author=user, text='...', score=5
+        )
+        Comment.objects.create(review=review, author=user, text='...')
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        for url, table, index in (
+            (url, 'reviews_review', 'review_title_pub_date'),
+            (
+                f'{url}{review.id}/comments/', 'reviews_comment',
+                'comment_review_pub_date',
+            ),
+        ):
+            plans = list_query_plans(user_client, url + params, table)
+            assert plans, f'Не найден запрос страницы для `{url}`.'
+            for plan in plans:
+                assert index in plan and 'TEMP B-TREE' not in plan, (
+                    f'Проверьте, что список `{url}` выбирается по индексу '
+                    f'{index} без сортировки: {plan}'
+                )
@@ -0,0 +1,149 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21TitleBatch:
+    url = '/api/v1/titles/batch/'
+
+    def test_01_permissions(self, client, user_client, moderator_client):
+        for api_client in (client, user_client, moderator_client):
+            response = api_client.post(
+                self.url, data='[]', content_type='application/json'
+            )
+            assert response.status_code in (
+                HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN
+            ), (
+                f'Проверьте, что `{self.url}` доступен только '
+                'администратору.'
+            )
+
+    def test_02_batch_create(self, admin_client):
+        Category.objects.create(name='Фильм', slug='films')
+        for slug in ('drama', 'comedy'):
+            Genre.objects.create(name=slug, slug=slug)
+        items = [
+            {
+                'name': f'Произведение {idx}', 'year': 2000,
+                'category': 'films', 'genre': ['drama', 'comedy'],
+            }
+            for idx in range(5)
+        ]
+        items.append({'name': 'Без жанра', 'year': 2000,
+                      'category': 'films', 'genre': ['missing']})
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post(self.url, data=items, format='json')
+        assert response.status_code == HTTPStatus.MULTI_STATUS, (
+            'Проверьте, что при частично некорректном пакете возвращается '
+            'статус 207.'
+        )
+        results = response.json()
+        assert [result['status'] for result in results] == [201] * 5 + [400]
+        assert 'genre' in results[-1]['errors']
+        assert results[0]['data']['name'] == 'Произведение 0'
+        title = Title.objects.get(pk=results[0]['data']['id'])
+        assert set(title.genre.values_list('slug', flat=True)) == {
+            'drama', 'comedy'
+        }
+        genre_selects = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "reviews_genre"' in query['sql']
+        ]
+        assert len(genre_selects) == 1, (
+            'Проверьте, что слаги жанров всего пакета загружаются '
+            'одним запросом.'
+        )
+
+    def test_03_limits(self, admin_client, settings):
+        settings.TITLE_BATCH_SIZE = 2
+        response = admin_client.post(
+            self.url, data=[{}, {}, {}], format='json'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        response = admin_client.post(self.url, data={}, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        response = admin_client.post(self.url, data=[{}], format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json()[0]['status'] == 400
+        response = admin_client.post(
+            self.url, data=[{'id': 99999999999999999999}], format='json'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что для id вне диапазона целых чисел базы '
+            'возвращается статус 400.'
+        )
+        assert 'id' in response.json()[0]['errors']
+
+    def test_04_batch_update(self, admin_client):
+        Category.objects.create(name='Фильм', slug='films')
+        for slug in ('drama', 'comedy'):
+            Genre.objects.create(name=slug, slug=slug)
+        old = Title.objects.create(name='Старое', year=1990)
+        old.genre.set(Genre.objects.filter(slug='drama'))
+        etag = admin_client.get(f'/api/v1/titles/{old.id}/')['ETag']
+        items = [
+            {'id': old.id, 'name': 'Новое', 'genre': ['comedy']},
+            {'name': 'Созданное', 'year': 2000, 'category': 'films',
+             'genre': ['drama']},
+            {'id': old.id, 'year': 2001},
+            {'id': 0, 'name': 'Нет такого'},
+            {'id': 'один', 'name': 'Неверный id'},
+        ]
+        response = admin_client.post(self.url, data=items, format='json')
+        assert response.status_code == HTTPStatus.MULTI_STATUS
+        assert [result['status'] for result in response.json()] == [
+            200, 201, 400, 404, 400
+        ], (
+            'Проверьте, что объект с id обновляет произведение, '
+            'без id - создает новое, а повтор, отсутствующий или неверный '
+            'id отклоняется.'
+        )
+        old.refresh_from_db()
+        assert (old.name, old.year) == ('Новое', 1990)
+        assert list(old.genre.values_list('slug', flat=True)) == ['comedy']
+        assert admin_client.get(
+            f'/api/v1/titles/{old.id}/', HTTP_IF_NONE_MATCH=etag
+        ).status_code == HTTPStatus.OK, (
+            'Проверьте, что пакетное обновление меняет ETag произведения.'
+        )
+
+        response = admin_client.post(
+            self.url, data=[{'id': old.id, 'year': 2002}], format='json'
+        )
+        assert response.status_code == HTTPStatus.OK
+
+    def test_05_bulk_insert(self, admin_client):
+        Category.objects.create(name='Фильм', slug='films')
+        Genre.objects.create(name='Драма', slug='drama')
+        deleted_id = Title.objects.create(name='Удаленное', year=2000).id
+        Title.objects.filter(pk=deleted_id).delete()
+        items = [
+            {'name': f'Произведение {idx}', 'year': 2000,
+             'category': 'films', 'genre': ['drama']}
+            for idx in range(20)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post(self.url, data=items, format='json')
+        assert response.status_code == HTTPStatus.CREATED
+        inserts = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "reviews_title"')
+        ]
+        assert len(inserts) == 1, (
+            'Проверьте, что произведения пакета записываются одной '
+            'массовой вставкой.'
+        )
+        ids = [result['data']['id'] for result in response.json()]
+        assert ids == list(range(deleted_id + 1, deleted_id + 21)), (
+            'Проверьте, что id новых произведений следуют за наибольшим '
+            'выданным id, в том числе удаленного произведения.'
+        )
+        assert [
+            Title.objects.get(pk=pk).name for pk in ids[:2]
+        ] == ['Произведение 0', 'Произведение 1']
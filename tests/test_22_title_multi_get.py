@@ -0,0 +1,42 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Review
+from tests.test_09_query_budget import create_catalogue
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22TitleMultiGet:
+    url = '/api/v1/titles/'
+
+    @pytest.mark.parametrize('count', (1, 40))
+    def test_01_multi_get(self, client, user, django_assert_num_queries,
+                          count):
+        titles = create_catalogue(count)
+        Review.objects.create(
+            title=titles[0], author=user, text='...', score=7
+        )
+        ids = [title.id for title in reversed(titles)] + [0]
+        # Произведения с категорией и рейтингом и жанры одним запросом.
+        with django_assert_num_queries(2):
+            response = client.get(
+                self.url, {'ids': ','.join(map(str, ids))}
+            )
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert [title['id'] for title in data] == ids[:-1], (
+            'Проверьте, что произведения возвращаются в порядке параметра '
+            'ids, а отсутствующие id пропускаются.'
+        )
+        assert data[-1]['rating'] == 7
+        assert data[-1]['category']['slug'] == 'films'
+        assert len(data[-1]['genre']) == 3
+
+    def test_02_invalid_ids(self, client, settings):
+        settings.TITLE_IDS_LIMIT = 2
+        for ids in ('1,a', '', '1,2,3', '99999999999999999999'):
+            response = client.get(self.url, {'ids': ids})
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Проверьте, что для ids={ids} возвращается статус 400.'
+            )